@@ -0,0 +1,141 @@
+"""
+Benchmark of the combat history label mapping.
+
+Scales the matches of examples/match_info.json up to thousands of matches, removes their labels and times how long
+cod_api's LabelResolver takes to fill them in again, next to the nested loops it replaced.
+
+    python benchmarks/bench_mapping.py --matches 1000 5000 20000
+"""
+
+import argparse
+import copy
+import json
+import os
+import pickle
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'cod_api'))
+
+from cod_api import LabelResolver  # noqa: E402
+
+EXAMPLE = os.path.join(ROOT, 'examples', 'match_info.json')
+
+
+def load_example():
+    """Load the example matches and collect the labels they carry as mapping files."""
+    with open(EXAMPLE, 'r') as file:
+        matches = json.load(file)['data']['matches']
+
+    weapons, perks, attachments = {}, {}, {}
+    for match in matches:
+        for loadout in match['player']['loadouts'] + match['player']['loadout']:
+            for slot in ('primaryWeapon', 'secondaryWeapon'):
+                weapon = loadout[slot]
+                if weapon['label']:
+                    weapons[weapon['name']] = weapon['label']
+                for attachment in weapon.get('Attachments', []):
+                    if attachment['label']:
+                        attachments[attachment['name']] = attachment['label']
+            for perk in loadout['perks'] + loadout['extraPerks']:
+                if perk['label']:
+                    perks[perk['name']] = perk['label']
+    # the example has no attachment labels, label them after their names so attachment lookups hit
+    for match in matches:
+        for loadout in match['player']['loadouts']:
+            for slot in ('primaryWeapon', 'secondaryWeapon'):
+                for attachment in loadout[slot].get('Attachments', []):
+                    if attachment['name'] != 'none':
+                        attachments.setdefault(attachment['name'], attachment['name'].title())
+    return matches, {'All Weapons': weapons, 'Attachments': attachments}, {'All Perks': perks}
+
+
+def strip_labels(obj):
+    """Remove every label so the mapping has to fill all of them in."""
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            if key == 'label':
+                obj[key] = None
+            else:
+                strip_labels(value)
+    elif isinstance(obj, list):
+        for item in obj:
+            strip_labels(item)
+
+
+def scaled_data(matches, count):
+    """Repeat the example matches until there are `count` of them."""
+    data = {'matches': [copy.deepcopy(matches[i % len(matches)]) for i in range(count)]}
+    strip_labels(data)
+    # the example is already beautified, give the matches epoch timestamps like the API returns
+    for i, match in enumerate(data['matches']):
+        match['utcStartSeconds'] = 1600000000 + i * 600
+        match['utcEndSeconds'] = match['utcStartSeconds'] + 540
+    return data
+
+
+def legacy_mapping(data, guns, perks):
+    """The nested per-item loops LabelResolver replaced: weapons and perks only, no attachments."""
+    for match in data['matches']:
+        try:
+            match['utcStartDateTime'] = datetime.fromtimestamp(
+                match['utcStartSeconds']).strftime("%A, %B %d, %Y, %I:%M:%S")
+            match['utcEndDateTime'] = datetime.fromtimestamp(
+                match['utcEndSeconds']).strftime("%A, %B %d, %Y, %I:%M:%S")
+        except KeyError:
+            pass
+        for loadouts in (match['player']['loadouts'], match['player']['loadout']):
+            for loadout in loadouts:
+                for slot in ('primaryWeapon', 'secondaryWeapon'):
+                    if loadout[slot]['label'] is None:
+                        try:
+                            loadout[slot]['label'] = guns[loadout[slot]['name']]
+                        except KeyError:
+                            pass
+                for perk in loadout['perks'] + loadout['extraPerks']:
+                    if perk['label'] is None:
+                        try:
+                            perk['label'] = perks[perk['name']]
+                        except KeyError:
+                            pass
+    return data
+
+
+def timed(func, data, repeat):
+    """Best wall time of `repeat` runs, each on a fresh copy of the data."""
+    best = float('inf')
+    frozen = pickle.dumps(data)
+    for _ in range(repeat):
+        fresh = pickle.loads(frozen)
+        start = time.perf_counter()
+        func(fresh)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark combat history label mapping")
+    parser.add_argument("--matches", type=int, nargs='+', default=[1000, 5000, 20000], help="Match counts to benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement, the best one is reported")
+    args = parser.parse_args()
+
+    matches, weapons, perks = load_example()
+    start = time.perf_counter()
+    resolver = LabelResolver(weapons, perks)
+    print(f"Indexed {len(resolver.weapons)} weapons, {len(resolver.attachments)} attachments and "
+          f"{len(resolver.perks)} perks in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    legacy_guns, legacy_perks = LabelResolver.index(weapons), LabelResolver.index(perks)
+    print(f"{'matches':>8} {'resolver':>12} {'matches/s':>12} {'legacy':>12} {'matches/s':>12}")
+    for count in args.matches:
+        data = scaled_data(matches, count)
+        resolver_time = timed(resolver.resolve, data, args.repeat)
+        legacy_time = timed(lambda d: legacy_mapping(d, legacy_guns, legacy_perks), data, args.repeat)
+        print(f"{count:>8} {resolver_time * 1000:>10.1f}ms {count / resolver_time:>12.0f} "
+              f"{legacy_time * 1000:>10.1f}ms {count / legacy_time:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
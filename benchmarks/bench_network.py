@@ -0,0 +1,185 @@
+"""
+Benchmark of cod_api's request path against the local replay server.
+
+Runs each scenario at several concurrency levels and reports requests per second, p50/p99 latency of the upstream
+requests and the peak memory allocated while the scenario ran:
+
+- sequential: one sync ``fullData`` call after the other
+- gather: ``fullDataAsync`` calls for many players with ``asyncio.gather``, at most `concurrency` in flight
+- batch: the same players through ``fetchManyAsync`` with ``limit=concurrency``
+- crawl: ``matchHistoryAsync`` of one player with ``concurrency`` windows in flight
+
+The client side rate limiter is opened up so the numbers show the request path itself, pass ``--throttle`` to keep
+the default rates. Results are written as JSON and can be compared with an earlier run:
+
+    python benchmarks/bench_network.py --output after.json --compare before.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'cod_api'))
+sys.path.insert(0, os.path.join(ROOT, 'utils'))
+
+import cod_api  # noqa: E402
+from cod_api import API, RateLimiter, SessionPool, TraceRecorder, games, platforms  # noqa: E402
+from replay_server import ReplayServer  # noqa: E402
+
+SCENARIOS = ('sequential', 'gather', 'batch', 'crawl')
+
+
+def make_api(url, concurrency, throttle, recorder):
+    limiter = None if throttle else RateLimiter({f: (1e6, 10 ** 6) for f in RateLimiter.defaultRates})
+    pool = SessionPool(limit_per_host=max(10, concurrency), traceSink=recorder)
+    api = API(pool=pool, rateLimiter=limiter, baseUrl=url)
+    api.login('benchmark')
+    # the first request loads the label mappings, keep it out of the measurement
+    api.ModernWarfare.fullData(platforms.Activision, 'warmup#0')
+    return api
+
+
+async def run_gather(api, players, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(player):
+        async with semaphore:
+            return await api.ModernWarfare.fullDataAsync(platforms.Activision, player)
+
+    return await asyncio.gather(*(fetch(p) for p in players))
+
+
+async def run_crawl(api, player, concurrency):
+    return [m async for m in api.ModernWarfare.matchHistoryAsync(platforms.Activision, player,
+                                                                  concurrency=concurrency, emptyWindows=2)]
+
+
+def scenario(name, api, requests, concurrency, run):
+    """Runs the scenario once, `run` keeps the players of repeated runs apart."""
+    players = [f'player#{run}{i}' for i in range(requests)]
+    if name == 'sequential':
+        for player in players:
+            api.ModernWarfare.fullData(platforms.Activision, player)
+    elif name == 'gather':
+        api.run(run_gather(api, players, concurrency))
+    elif name == 'batch':
+        api.fetchMany([(games.ModernWarfare, 'fullData', platforms.Activision, p) for p in players], concurrency)
+    elif name == 'crawl':
+        api.run(run_crawl(api, players[0], concurrency))
+
+
+def percentile(values, share):
+    return values[min(len(values) - 1, int(len(values) * share))] if values else None
+
+
+def measure(name, url, requests, concurrency, throttle):
+    recorder = TraceRecorder()
+    with make_api(url, concurrency, throttle, recorder) as api:
+        recorder.traces.clear()
+        start = time.perf_counter()
+        scenario(name, api, requests, concurrency, 'a')
+        seconds = time.perf_counter() - start
+        latencies = sorted(t.total for t in recorder.traces if t.total is not None)
+        sent = len(recorder.traces)
+
+        # memory is measured in a second run, tracemalloc slows everything down
+        tracemalloc.start()
+        scenario(name, api, requests, concurrency, 'b')
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        'scenario': name,
+        'concurrency': concurrency,
+        'requests': sent,
+        'seconds': seconds,
+        'rps': sent / seconds if seconds else None,
+        'p50': percentile(latencies, 0.5),
+        'p99': percentile(latencies, 0.99),
+        'peakMemory': peak,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, path):
+    """Print the change in requests per second and p99 against an earlier result file."""
+    with open(path, 'r') as file:
+        earlier = {(r['scenario'], r['concurrency']): r for r in json.load(file)['results']}
+    print(f"\nCompared with {path}")
+    print(f"{'scenario':<12} {'conc':>5} {'rps':>10} {'change':>8} {'p99 ms':>10} {'change':>8}")
+    for result in results:
+        before = earlier.get((result['scenario'], result['concurrency']))
+        if before is None or not before['rps'] or not before['p99']:
+            continue
+        print(f"{result['scenario']:<12} {result['concurrency']:>5} {result['rps']:>10.0f} "
+              f"{(result['rps'] / before['rps'] - 1) * 100:>7.1f}% {result['p99'] * 1000:>10.1f} "
+              f"{(result['p99'] / before['p99'] - 1) * 100:>7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cod_api's request path against the replay server")
+    parser.add_argument("--scenarios", nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, nargs='+', default=[1, 4, 16, 64],
+                        help="Concurrency levels, sequential always runs at 1")
+    parser.add_argument("--requests", type=int, default=200, help="Players fetched by sequential, gather and batch")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds the replay server delays responses")
+    parser.add_argument("--history-size", type=int, default=500, help="Matches in the crawled history")
+    parser.add_argument("--url", help="Use an already running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8765, help="Port of the replay server started by the benchmark")
+    parser.add_argument("--throttle", action="store_true", help="Keep the client side rate limiter's default rates")
+    parser.add_argument("--output", default="bench_network.json", help="JSON file the results are written to")
+    parser.add_argument("--compare", help="Earlier result file to compare with")
+    args = parser.parse_args()
+
+    server = None
+    if args.url is None:
+        server = ReplayServer(port=args.port, latency=args.latency, history_size=args.history_size).start()
+    url = args.url or server.url
+
+    results = []
+    print(f"{'scenario':<12} {'conc':>5} {'requests':>9} {'rps':>10} {'p50 ms':>10} {'p99 ms':>10} {'peak KiB':>10}")
+    try:
+        for name in args.scenarios:
+            for concurrency in ([1] if name == 'sequential' else args.concurrency):
+                result = measure(name, url, args.requests, concurrency, args.throttle)
+                results.append(result)
+                print(f"{name:<12} {concurrency:>5} {result['requests']:>9} {result['rps']:>10.0f} "
+                      f"{result['p50'] * 1000:>10.1f} {result['p99'] * 1000:>10.1f} "
+                      f"{result['peakMemory'] / 1024:>10.0f}")
+    finally:
+        if server is not None:
+            server.stop()
+
+    report = {
+        'version': cod_api.__version__,
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'server': {'url': url, 'latency': args.latency if server is not None else None},
+        'throttle': args.throttle,
+        'results': results,
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
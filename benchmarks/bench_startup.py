@@ -0,0 +1,105 @@
+"""
+Benchmark of cod_api's startup time.
+
+Measures ``import cod_api`` with ``python -X importtime`` and a ``cod_api_tool.py --clean`` run in a scratch
+directory, and lists the networking libraries each of them loaded. Neither should load any: they are imported on the
+first request.
+
+    python benchmarks/bench_startup.py --runs 10 --check
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NETWORKING = ('aiohttp', 'requests', 'urllib3', 'yarl', 'multidict', 'certifi')
+
+# Prints the networking modules loaded by the code before it
+LOADED = f"import sys; print(','.join(m for m in {NETWORKING!r} if m in sys.modules))"
+
+
+def environment():
+    # the tool's own modules are found next to it, runpy doesn't add its directory to the path
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.join(ROOT, 'cod_api'), ROOT]))
+    # the compiled modules are cached as usual, only the import itself is measured
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    return env
+
+
+def import_times(runs):
+    """Median cumulative import time of cod_api and the modules with the largest own import time."""
+    totals, own = [], {}
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import cod_api'], env=environment(),
+                                capture_output=True, text=True, check=True)
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, cumulative_us, name = (part.strip() for part in line[len('import time:'):].split('|'))
+            own.setdefault(name.strip(), []).append(int(self_us))
+            if name.strip() == 'cod_api':
+                totals.append(int(cumulative_us))
+    slowest = sorted(((statistics.median(v), k) for k, v in own.items()), reverse=True)[:10]
+    return statistics.median(totals), slowest
+
+
+def loaded(code, **kwargs):
+    """The networking modules a python process running `code` ended up with."""
+    result = subprocess.run([sys.executable, '-c', f'{code}; {LOADED}'], env=environment(), capture_output=True,
+                            text=True, check=True, **kwargs)
+    return {m for m in result.stdout.strip().splitlines()[-1].split(',') if m}
+
+
+# Site packages of some installs import e.g. certifi at startup, they aren't counted
+BASELINE = loaded('pass')
+
+
+def clean_run(runs):
+    """Median wall time of ``cod_api_tool.py --clean`` and the networking modules it loaded."""
+    scratch = tempfile.mkdtemp()
+    try:
+        os.makedirs(os.path.join(scratch, 'data'))
+        shutil.copy(os.path.join(ROOT, 'data', 'replacements.json'), os.path.join(scratch, 'data'))
+        with open(os.path.join(scratch, 'cookie.txt'), 'w') as file:
+            file.write('benchmark')
+        tool = os.path.join(ROOT, 'cod_api_tool.py')
+        code = f"import runpy, sys; sys.argv = [{tool!r}, '--clean']; runpy.run_path({tool!r}, run_name='__main__')"
+        times, modules = [], set()
+        for _ in range(runs):
+            start = time.perf_counter()
+            modules = loaded(code, cwd=scratch)
+            times.append(time.perf_counter() - start)
+        return statistics.median(times), sorted(modules - BASELINE)
+    finally:
+        shutil.rmtree(scratch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cod_api's startup time")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per measurement, the median is reported")
+    parser.add_argument("--check", action="store_true", help="Exit with an error if networking libraries load")
+    args = parser.parse_args()
+
+    total, slowest = import_times(args.runs)
+    imported = sorted(loaded('import cod_api') - BASELINE)
+    print(f"import cod_api: {total / 1000:.1f} ms, networking libraries loaded: {', '.join(imported) or 'none'}")
+    print(f"{'self ms':>9}  module")
+    for self_us, name in slowest:
+        print(f"{self_us / 1000:>9.2f}  {name}")
+
+    seconds, cleaned = clean_run(args.runs)
+    print(f"\ncod_api_tool.py --clean: {seconds * 1000:.0f} ms, "
+          f"networking libraries loaded: {', '.join(cleaned) or 'none'}")
+
+    if args.check and (imported or cleaned):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
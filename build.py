@@ -14,6 +14,7 @@ DIST_PATH = "bin/build"
 script_dir = os.path.abspath(os.path.dirname(__file__))
 charset_normalizer_data = os.path.join('deps', 'frequencies.json')
 replacements_json = os.path.join(script_dir, 'data', 'replacements.json')
+mappings_json = os.path.join(script_dir, 'cod_api', 'cod_api', 'mappings.json')
 
 # Verify replacements.json exists before building
 if not os.path.exists(replacements_json):
@@ -35,7 +36,8 @@ PyInstaller.__main__.run([
     '--distpath', DIST_PATH,
     # This is the correct way to add the data file - preserve the directory structure
     '--add-data', f"{charset_normalizer_data};charset_normalizer/assets",
-    '--add-data', f"{replacements_json};data"  # Note: using 'data' as the destination folder
+    '--add-data', f"{replacements_json};data",  # Note: using 'data' as the destination folder
+    '--add-data', f"{mappings_json};cod_api"  # Offline label mappings bundled with the cod_api package
 ])
 
 # Clean up the build directory and spec file
@@ -3,15 +3,81 @@ __version__ = "2.0.2"
 # Imports
 import asyncio
 import enum
+import hashlib
+import importlib
 import json
-import uuid
+import os
+import random
+import threading
+import time
 from abc import abstractmethod
+from collections import deque, namedtuple
+from itertools import chain
 from datetime import datetime
-from urllib.parse import quote
+from email.utils import parsedate_to_datetime
+from urllib.parse import quote, urlsplit
 
-import aiohttp
-import requests
-from aiohttp import ClientResponseError
+
+# Lazy imports
+
+class _LazyModule:
+    """Imports a module on first attribute access, so ``import cod_api`` doesn't pay for the networking libraries"""
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+class _Once:
+    """Class attribute computed on first access"""
+    def __init__(self, factory):
+        self.factory = factory
+        self.value = None
+
+    def __get__(self, instance, owner):
+        if self.value is None:
+            self.value = self.factory()
+        return self.value
+
+
+class _SubClient:
+    """Sub client of an ``API`` object, created on first access"""
+    def __init__(self, cls: str):
+        self.cls = cls
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, api, owner):
+        if api is None:
+            return self
+        client = getattr(owner, self.cls)(api)
+        api.__dict__[self.name] = client
+        return client
+
+
+aiohttp = _LazyModule("aiohttp")
+uuid = _LazyModule("uuid")
+
+
+# Files
+
+def _writeJson(path: str, data, mode: int = None) -> None:
+    """
+    writes data as JSON next to ``path`` and swaps it in, so readers never see a half written file
+
+    mode: permissions of a newly created file (e.g. ``0o600``), the default ones of ``open`` if None
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp if mode is None else os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode), "w") as file:
+        json.dump(data, file)
+    os.replace(temp, path)
 
 
 # Enums
@@ -43,6 +109,1114 @@ class friendActions(enum.Enum):
     Unblock = "unblock"
 
 
+# Batch request: title (games), endpoint (e.g. "fullData", "combatHistory"), platform (platforms), gamertag
+BatchRequest = namedtuple("BatchRequest", ["title", "endpoint", "platform", "gamertag"])
+
+
+# Logged in user: userName and its identities (tuple of Identity), read from userInfo.json
+UserInfo = namedtuple("UserInfo", ["userName", "identities"])
+Identity = namedtuple("Identity", ["platform", "gamertag", "accountID"])
+
+
+class UserInfoFile:
+    """
+    The logged in user's identities from a userInfo.json file
+
+    The file is parsed on first use and only parsed again once its modification time or size changed, so the ``Me``
+    requests that need the user's platform and gamertag don't read it every time.
+    """
+    def __init__(self, path: str = "userInfo.json"):
+        self.path = path
+        self._stamp = None
+        self._info = None
+        self._lock = threading.Lock()
+
+    def load(self) -> UserInfo:
+        stat = os.stat(self.path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if stamp != self._stamp:
+                with open(self.path, "r") as file:
+                    self._info = self.parse(json.load(file))
+                self._stamp = stamp
+            return self._info
+
+    @staticmethod
+    def parse(rawData: dict) -> UserInfo:
+        identities = rawData.get('identities', [])
+        return UserInfo(rawData['userInfo']['userName'],
+                        tuple(Identity(i['provider'], i['username'], i['accountID']) for i in identities))
+
+
+# Match history cursor
+
+class HistoryCursor:
+    """
+    Position of a match history crawl that can be saved and resumed
+
+    Matches older than ``end`` (epoch milliseconds) are still to be fetched, ``done`` is set once the crawl reached
+    the start of the player's history. ``None`` as ``end`` starts at the current time.
+    """
+    def __init__(self, end: int = None, done: bool = False):
+        self.end = end
+        self.done = done
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as file:
+            json.dump({"end": self.end, "done": self.done}, file)
+
+    @classmethod
+    def load(cls, path: str) -> "HistoryCursor":
+        """loads a saved cursor, a missing file starts a new crawl"""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "r") as file:
+            return cls(**json.load(file))
+
+
+# Account
+
+class Account:
+    """
+    Login state of one SSO token: the token, the cookies sent with its requests and whether it was validated
+
+    Every ``API`` object owns its own account, so clients logged in with different tokens don't share cookies.
+    """
+    defaultCookies = {"new_SiteId": "cod", "ACT_SSO_LOCALE": "en_US", "country": "US",
+                      "ACT_SSO_COOKIE_EXPIRY": "1645556143194"}
+
+    def __init__(self, ssoToken: str = None):
+        self.cookies = dict(self.defaultCookies)
+        self.ssoToken = None
+        self.loggedIn = False
+        # set by a lazy login until the token is validated by the first request
+        self.pending = False
+        if ssoToken is not None:
+            self.setToken(ssoToken)
+
+    def setToken(self, ssoToken: str) -> None:
+        """switches the account to another token, it has to be validated again"""
+        self.cookies = dict(self.defaultCookies, ACT_SSO_COOKIE=ssoToken)
+        self.ssoToken = ssoToken
+        self.loggedIn = False
+        self.pending = False
+
+
+class LoginCache:
+    """
+    Remembers validated SSO tokens together with the cookies the server returned for them
+
+    Logging in with a token validated less than ``maxAge`` seconds ago restores its cookies from the file instead of
+    asking the identities endpoint again. Tokens are only stored as hashes, but the cookies contain the token itself,
+    so the file is created readable by its owner only.
+
+    Parameters
+    ----------
+    path: str
+        file the logins are persisted in
+    maxAge: float
+        seconds a validated login is trusted without validating it again
+    """
+    def __init__(self, path: str = os.path.join(os.path.expanduser("~"), ".cod_api", "logins.json"),
+                 maxAge: float = 24 * 60 * 60):
+        self.path = path
+        self.maxAge = maxAge
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def __key(ssoToken: str) -> str:
+        return hashlib.sha256(ssoToken.encode("utf-8")).hexdigest()
+
+    def __read(self) -> dict:
+        try:
+            with open(self.path, "r") as file:
+                logins = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        now = time.time()
+        return {k: v for k, v in logins.items() if isinstance(v, dict) and v.get("expires", 0) > now}
+
+    def get(self, ssoToken: str):
+        """returns the cookies of a login that is still trusted, None otherwise"""
+        with self._lock:
+            login = self.__read().get(self.__key(ssoToken))
+        return login["cookies"] if login is not None else None
+
+    def set(self, ssoToken: str, cookies: dict) -> None:
+        with self._lock:
+            logins = self.__read()
+            logins[self.__key(ssoToken)] = {"expires": time.time() + self.maxAge, "cookies": cookies}
+            _writeJson(self.path, logins, 0o600)
+
+    def forget(self, ssoToken: str) -> None:
+        with self._lock:
+            logins = self.__read()
+            if logins.pop(self.__key(ssoToken), None) is not None:
+                _writeJson(self.path, logins, 0o600)
+
+
+class TokenPool:
+    """
+    Spreads requests over several logged in accounts
+
+    Accounts take turns in round-robin order. An account that receives a 429 cools down for the ``Retry-After`` the
+    server sent (``cooldown`` seconds if it sent none) and is skipped meanwhile, a 503 only cools it down if the server
+    sent a ``Retry-After`` since it usually means the whole service is overloaded. An account whose error rate over
+    its last ``window`` responses exceeds ``maxErrorRate`` is only used when no healthy account is ready. Accounts that
+    receive a 401 or 403 are flagged to be validated again and dropped if the token is rejected.
+
+    Parameters
+    ----------
+    cooldown: float
+        seconds an account rests after hitting a limit without a Retry-After header
+    window: int
+        number of recent responses the error rate is computed over
+    maxErrorRate: float
+        error rate above which an account is avoided
+    """
+    def __init__(self, cooldown: float = 10.0, window: int = 20, maxErrorRate: float = 0.5):
+        self.cooldown = cooldown
+        self.window = window
+        self.maxErrorRate = maxErrorRate
+        self.accounts = []
+        self._health = {}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    class _Health:
+        def __init__(self, window: int):
+            self.results = deque(maxlen=window)
+            self.requests = 0
+            self.coolUntil = 0.0
+            self.suspect = False
+
+        @property
+        def errorRate(self) -> float:
+            return sum(self.results) / len(self.results) if self.results else 0.0
+
+    def __len__(self) -> int:
+        return len(self.accounts)
+
+    def add(self, account: Account) -> None:
+        with self._lock:
+            if account not in self._health:
+                self.accounts.append(account)
+                self._health[account] = self._Health(self.window)
+
+    def remove(self, account: Account) -> None:
+        with self._lock:
+            if self._health.pop(account, None) is not None:
+                self.accounts.remove(account)
+
+    def pick(self) -> Account:
+        """returns the account that sends the next request, None if the pool is empty"""
+        with self._lock:
+            count = len(self.accounts)
+            if not count:
+                return None
+            now = time.monotonic()
+            order = [self.accounts[(self._next + i) % count] for i in range(count)]
+            # accounts waiting for validation are only used if nothing else is left
+            order = [a for a in order if not self._health[a].suspect] or order
+            ready = [a for a in order if self._health[a].coolUntil <= now]
+            healthy = [a for a in ready if self._health[a].errorRate <= self.maxErrorRate]
+            if healthy:
+                account = healthy[0]
+            elif ready:
+                account = min(ready, key=lambda a: self._health[a].errorRate)
+            else:
+                account = min(order, key=lambda a: self._health[a].coolUntil)
+            self._next = (self.accounts.index(account) + 1) % count
+            self._health[account].requests += 1
+            return account
+
+    def wait(self, account: Account) -> float:
+        """seconds until the account's cooldown ends"""
+        health = self._health.get(account)
+        return max(0.0, health.coolUntil - time.monotonic()) if health is not None else 0.0
+
+    def report(self, account: Account, status: int, retryAfter: str = None) -> None:
+        """records the status of a response received with the account, None if no response was received"""
+        with self._lock:
+            health = self._health.get(account)
+            if health is None:
+                return
+            health.results.append(status is None or status >= 400)
+            pause = RateLimiter.retryAfter(retryAfter) if status in (429, 503) else None
+            if status == 429 or pause is not None:
+                health.coolUntil = time.monotonic() + (pause if pause is not None else self.cooldown)
+            elif status in (401, 403):
+                health.suspect = True
+
+    def suspects(self) -> list:
+        """returns the accounts flagged for validation that aren't cooling down and clears their flags"""
+        with self._lock:
+            now = time.monotonic()
+            flagged = [a for a, h in self._health.items() if h.suspect and h.coolUntil <= now]
+            for account in flagged:
+                self._health[account].suspect = False
+            return flagged
+
+    def flag(self, account: Account) -> None:
+        """flags an account whose validation couldn't be completed, it is validated again after a cooldown"""
+        with self._lock:
+            health = self._health.get(account)
+            if health is not None:
+                health.suspect = True
+                health.coolUntil = max(health.coolUntil, time.monotonic() + self.cooldown)
+
+    def stats(self) -> dict:
+        """SSO token -> requests sent, error rate and remaining cooldown of each account"""
+        with self._lock:
+            return {a.ssoToken: {"requests": h.requests, "errorRate": h.errorRate,
+                                 "cooldown": max(0.0, h.coolUntil - time.monotonic())}
+                    for a, h in self._health.items()}
+
+
+# Connection pool
+
+class SessionPool:
+    """
+    Long-lived aiohttp session shared by every request of an ``API`` object
+
+    Keeps keep-alive connections (and their DNS/TLS state) open between requests instead of opening a new
+    session for every GET. aiohttp sessions are bound to the event loop they were created in, so one session is
+    kept per running loop. A session is closed with ``close`` or once its loop winds down, e.g. at the end of
+    ``asyncio.run``.
+
+    Parameters
+    ----------
+    limit: int
+        total number of simultaneous connections
+    limit_per_host: int
+        number of simultaneous connections to the same host (0 is unlimited)
+    keepalive_timeout: float
+        seconds an idle connection is kept open for reuse
+    ttl_dns_cache: int
+        seconds resolved host addresses are cached
+    timeout: float
+        total timeout of a single request in seconds
+    traceSink: callable
+        called with a ``RequestTrace`` of every request, requests aren't traced if not given
+    """
+    def __init__(self, limit: int = 100, limit_per_host: int = 10, keepalive_timeout: float = 30,
+                 ttl_dns_cache: int = 300, timeout: float = 30, traceSink=None):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        self.timeout = timeout
+        self.traceSink = traceSink
+        self._sessions = {}
+
+    @property
+    def tracing(self) -> bool:
+        return self.traceSink is not None
+
+    def emit(self, trace: "RequestTrace") -> None:
+        """hands a finished trace to the sink"""
+        if self.traceSink is not None:
+            self.traceSink(trace)
+
+    def get(self) -> "aiohttp.ClientSession":
+        """returns the session of the running event loop, creating it on first use"""
+        loop = asyncio.get_running_loop()
+        session, _ = self._sessions.get(loop, (None, None))
+        if session is None or session.closed:
+            # forget sessions of loops that are already gone
+            for stale in [l for l in self._sessions if l.is_closed()]:
+                del self._sessions[stale]
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                             keepalive_timeout=self.keepalive_timeout,
+                                             ttl_dns_cache=self.ttl_dns_cache)
+            # cookies are sent per request, the shared jar must not mix them up between requests
+            session = aiohttp.ClientSession(connector=connector,
+                                            timeout=aiohttp.ClientTimeout(total=self.timeout),
+                                            cookie_jar=aiohttp.DummyCookieJar(),
+                                            trace_configs=[RequestTrace.config()] if self.tracing else None)
+            # asyncio.run cancels the tasks still pending before it closes the loop, this one closes the session then
+            self._sessions[loop] = (session, loop.create_task(self.__closeOnExit(session)))
+        return session
+
+    @staticmethod
+    async def __closeOnExit(session: "aiohttp.ClientSession") -> None:
+        try:
+            await asyncio.get_running_loop().create_future()
+        finally:
+            await session.close()
+
+    async def close(self) -> None:
+        """closes the session of the running event loop and its connections"""
+        session, closer = self._sessions.pop(asyncio.get_running_loop(), (None, None))
+        if closer is not None:
+            closer.cancel()
+            await asyncio.gather(closer, return_exceptions=True)
+        if session is not None and not session.closed:
+            await session.close()
+
+
+# Tracing
+
+class RequestTrace:
+    """
+    Phase timings of one request in seconds, filled in by aiohttp's tracing hooks
+
+    ``poolWait`` is the time spent waiting for a free connection of the pool, ``dns`` and ``connect`` are only set
+    when a new connection was opened (``connect`` includes the TLS handshake, which aiohttp doesn't report on its
+    own), ``ttfb`` runs from the moment the connection was ready until the response headers arrived and ``body`` until
+    the body was read. Phases that didn't happen are None, ``error`` holds the exception type of a failed request.
+    """
+    def __init__(self, url: str):
+        self.url = url
+        self.status = None
+        self.error = None
+        self.reused = False
+        self.poolWait = None
+        self.dns = None
+        self.connect = None
+        self.ttfb = None
+        self.body = None
+        self.total = None
+        self._marks = {}
+
+    def mark(self, name: str) -> None:
+        self._marks[name] = time.perf_counter()
+
+    def _span(self, start: str, end: str):
+        if start in self._marks and end in self._marks:
+            return self._marks[end] - self._marks[start]
+        return None
+
+    def finish(self, status: int = None, error: str = None) -> None:
+        """computes the phases once the body was read or the request failed"""
+        self.mark("done")
+        self.status, self.error = status, error
+        self.poolWait = self._span("queued", "dequeued")
+        self.dns = self._span("dnsStart", "dnsEnd")
+        connect = self._span("connectStart", "connectEnd")
+        # aiohttp resolves the host while creating the connection, keep the phases apart
+        self.connect = connect - (self.dns or 0.0) if connect is not None else None
+        ready = next((m for m in ("connectEnd", "dequeued", "start") if m in self._marks), None)
+        if ready is not None and "headers" in self._marks:
+            self.ttfb = self._span(ready, "headers")
+            self.body = self._span("headers", "done")
+        self.total = self._span("start", "done")
+
+    def asDict(self) -> dict:
+        return {k: v for k, v in vars(self).items() if not k.startswith("_")}
+
+    @staticmethod
+    def config() -> "aiohttp.TraceConfig":
+        """a TraceConfig that marks the phases on the ``RequestTrace`` passed as ``trace_request_ctx``"""
+        def marker(name):
+            async def hook(session, context, params):
+                if isinstance(context.trace_request_ctx, RequestTrace):
+                    context.trace_request_ctx.mark(name)
+            return hook
+
+        async def reused(session, context, params):
+            if isinstance(context.trace_request_ctx, RequestTrace):
+                context.trace_request_ctx.reused = True
+
+        config = aiohttp.TraceConfig()
+        config.on_request_start.append(marker("start"))
+        config.on_connection_queued_start.append(marker("queued"))
+        config.on_connection_queued_end.append(marker("dequeued"))
+        config.on_connection_create_start.append(marker("connectStart"))
+        config.on_connection_create_end.append(marker("connectEnd"))
+        config.on_dns_resolvehost_start.append(marker("dnsStart"))
+        config.on_dns_resolvehost_end.append(marker("dnsEnd"))
+        config.on_connection_reuseconn.append(reused)
+        config.on_request_end.append(marker("headers"))
+        return config
+
+
+class TraceRecorder:
+    """
+    Trace sink that keeps the traces in memory and summarizes them
+
+    Parameters
+    ----------
+    maxTraces: int
+        number of most recent traces kept
+    """
+    phases = ("poolWait", "dns", "connect", "ttfb", "body", "total")
+
+    def __init__(self, maxTraces: int = 10000):
+        self.traces = deque(maxlen=maxTraces)
+
+    def __call__(self, trace: RequestTrace) -> None:
+        self.traces.append(trace)
+
+    def summary(self) -> dict:
+        """phase -> count, mean, median, 95th percentile and maximum of the recorded traces"""
+        summary = {}
+        for phase in self.phases:
+            values = sorted(v for v in (getattr(t, phase) for t in self.traces) if v is not None)
+            if values:
+                summary[phase] = {"count": len(values), "mean": sum(values) / len(values),
+                                  "p50": values[len(values) // 2], "p95": values[int(len(values) * 0.95)],
+                                  "max": values[-1]}
+        return summary
+
+
+# Rate limiting
+
+class RateLimiter:
+    """
+    Client side token bucket rate limiter, one bucket per endpoint family
+
+    Families are the first segment of the request route (``stats``, ``crm``, ``loot``, ``userfeed``), every other
+    route shares the ``default`` bucket. A 429 or 503 response halves the family's rate and pauses it for the
+    ``Retry-After`` the server sent, every successful response then raises the rate again by a fraction of the
+    configured one until it is reached.
+
+    Parameters
+    ----------
+    rates: dict
+        family -> (requests per second, burst size), merged over ``defaultRates``
+    minRate: float
+        lowest rate a family is slowed down to in requests per second
+    recovery: float
+        fraction of the configured rate restored by every successful response
+    """
+    defaultRates = {
+        "stats": (4.0, 8),
+        "crm": (4.0, 8),
+        "loot": (2.0, 4),
+        "userfeed": (2.0, 4),
+        "default": (4.0, 8)
+    }
+
+    def __init__(self, rates: dict = None, minRate: float = 0.2, recovery: float = 0.05):
+        self.rates = {**self.defaultRates, **(rates or {})}
+        self.minRate = minRate
+        self.recovery = recovery
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    class _Bucket:
+        def __init__(self, rate: float, burst: int):
+            self.maxRate = self.rate = rate
+            self.burst = self.tokens = burst
+            self.updated = time.monotonic()
+            self.pausedUntil = 0.0
+
+    @staticmethod
+    def family(route: str) -> str:
+        """returns the endpoint family of a route relative to ``baseUrl``, which is its first path segment"""
+        return route.lstrip("/").split("/", 1)[0]
+
+    def __bucket(self, family: str, key) -> _Bucket:
+        if family not in self.rates:
+            family = "default"
+        if (family, key) not in self._buckets:
+            self._buckets[family, key] = self._Bucket(*self.rates[family])
+        return self._buckets[family, key]
+
+    async def acquire(self, family: str, key=None) -> None:
+        """
+        waits until the family's bucket allows another request
+
+        key: separates buckets of the same family, e.g. the SSO token when limits are per account
+        """
+        with self._lock:
+            bucket = self.__bucket(family, key)
+            now = time.monotonic()
+            bucket.tokens = min(bucket.burst, bucket.tokens + (now - bucket.updated) * bucket.rate)
+            bucket.updated = now
+            # take the token now and wait for it to be refilled, so concurrent callers queue up behind each other
+            bucket.tokens -= 1
+            delay = max(-bucket.tokens / bucket.rate if bucket.tokens < 0 else 0.0, bucket.pausedUntil - now)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def feedback(self, family: str, status: int, retryAfter: str = None, key=None) -> None:
+        """adapts the family's rate to the status of a response"""
+        with self._lock:
+            bucket = self.__bucket(family, key)
+            if status in (429, 503):
+                bucket.rate = max(self.minRate, bucket.rate / 2)
+                pause = self.retryAfter(retryAfter)
+                bucket.pausedUntil = time.monotonic() + (pause if pause is not None else 1 / bucket.rate)
+            elif status < 400 and bucket.rate < bucket.maxRate:
+                bucket.rate = min(bucket.maxRate, bucket.rate + bucket.maxRate * self.recovery)
+
+    @staticmethod
+    def retryAfter(value: str):
+        """seconds to wait according to a Retry-After header (seconds or an HTTP date), None if it's not usable"""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+# Retries
+
+class RetryPolicy:
+    """
+    Retries transient request failures with decorrelated jitter between attempts
+
+    Timeouts, dropped connections and the statuses in ``retryStatuses`` are retried, every other error is returned
+    right away. Each pause is drawn between ``base`` and three times the previous pause, capped at ``cap`` seconds.
+
+    Parameters
+    ----------
+    attempts: int
+        total number of attempts of a request, 1 disables retrying
+    base: float
+        smallest pause between attempts in seconds
+    cap: float
+        largest pause between attempts in seconds
+    retryStatuses: tuple
+        HTTP statuses that are worth another attempt
+    """
+    def __init__(self, attempts: int = 4, base: float = 0.5, cap: float = 20.0,
+                 retryStatuses: tuple = (429, 500, 502, 503, 504)):
+        self.attempts = max(1, attempts)
+        self.base = base
+        self.cap = cap
+        self.retryStatuses = frozenset(retryStatuses)
+
+    def retryable(self, status) -> bool:
+        """status of the failed attempt, ``None`` if no response was received at all"""
+        return status is None or status in self.retryStatuses
+
+    def delays(self):
+        """yields the pauses between consecutive attempts"""
+        delay = self.base
+        while True:
+            delay = min(self.cap, random.uniform(self.base, delay * 3))
+            yield delay
+
+
+class CircuitBreaker:
+    """
+    Fails requests fast while a host is down
+
+    After ``threshold`` consecutive failures (no response or a 5xx status) the host's circuit opens and requests to
+    it fail with ``CircuitOpen`` without being sent. After ``resetTimeout`` seconds a single trial request is let
+    through: its success closes the circuit again, its failure opens it for another ``resetTimeout``.
+    """
+    def __init__(self, threshold: int = 5, resetTimeout: float = 30.0):
+        self.threshold = threshold
+        self.resetTimeout = resetTimeout
+        self._failures = {}
+        self._openedAt = {}
+        self._trial = set()
+        self._lock = threading.Lock()
+
+    def allow(self, host: str) -> bool:
+        with self._lock:
+            openedAt = self._openedAt.get(host)
+            if openedAt is None:
+                return True
+            if host in self._trial or time.monotonic() - openedAt < self.resetTimeout:
+                return False
+            # half open, let one request find out whether the host is back
+            self._trial.add(host)
+            return True
+
+    def success(self, host: str) -> None:
+        with self._lock:
+            self._failures.pop(host, None)
+            self._openedAt.pop(host, None)
+            self._trial.discard(host)
+
+    def failure(self, host: str) -> None:
+        with self._lock:
+            self._failures[host] = self._failures.get(host, 0) + 1
+            if host in self._trial or self._failures[host] >= self.threshold:
+                self._openedAt[host] = time.monotonic()
+                self._trial.discard(host)
+
+
+# Response cache
+
+class ResponseCache:
+    """
+    On-disk cache of successful profile API responses
+
+    Responses are stored as JSON files keyed by the full request url and the account (sso token) that requested
+    them, a cached response younger than its endpoint's TTL is returned without any network request. Endpoints are
+    named after their url template (``fullDataUrl``, ``matchInfoUrl``, ...), endpoints without a TTL are not cached.
+    Expired responses are removed when they are read and, at most once per TTL, from the whole endpoint folder when a
+    response is stored.
+
+    Parameters
+    ----------
+    directory: str
+        folder the responses are stored in
+    ttls: dict
+        endpoint -> seconds a response stays fresh, ``None`` for never expiring, merged over ``defaultTtls``
+    """
+    defaultTtls = {
+        "mapListUrl": 3 * 24 * 60 * 60,
+        "seasonLootUrl": 3 * 24 * 60 * 60,
+        "fullDataUrl": 5 * 60,
+        "combatHistoryUrl": 5 * 60,
+        "breakdownUrl": 5 * 60,
+        # finished matches never change
+        "matchInfoUrl": None
+    }
+
+    def __init__(self, directory: str = "cache", ttls: dict = None):
+        self.directory = directory
+        self.ttls = {**self.defaultTtls, **(ttls or {})}
+        self.enabled = True
+        self._pruned = {}
+
+    def caches(self, endpoint: str) -> bool:
+        return self.enabled and endpoint in self.ttls and self.ttls[endpoint] != 0
+
+    def __path(self, endpoint: str, url: str, account: str) -> str:
+        key = hashlib.sha256(f"{account}\n{url}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, endpoint, f"{key}.json")
+
+    def get(self, endpoint: str, url: str, account: str):
+        """returns the cached response or None if there is no fresh one"""
+        if not self.caches(endpoint):
+            return None
+        path = self.__path(endpoint, url, account)
+        try:
+            ttl = self.ttls[endpoint]
+            if ttl is not None and time.time() - os.path.getmtime(path) > ttl:
+                os.remove(path)
+                return None
+            with open(path, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, endpoint: str, url: str, account: str, response: dict) -> None:
+        if not self.caches(endpoint):
+            return
+        _writeJson(self.__path(endpoint, url, account), response)
+        ttl = self.ttls[endpoint]
+        if ttl is not None and time.time() - self._pruned.get(endpoint, 0) > ttl:
+            self.prune(endpoint)
+
+    def prune(self, endpoint: str = None) -> None:
+        """removes the expired responses of an endpoint, or of every endpoint"""
+        now = time.time()
+        for name in [endpoint] if endpoint is not None else list(self.ttls):
+            ttl = self.ttls.get(name)
+            if ttl is None:
+                continue
+            self._pruned[name] = now
+            folder = os.path.join(self.directory, name)
+            try:
+                entries = list(os.scandir(folder))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.name.endswith(".json") and now - entry.stat().st_mtime > ttl:
+                        os.remove(entry.path)
+                except OSError:
+                    # removed concurrently
+                    pass
+
+    def clear(self) -> None:
+        """removes every cached response"""
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    os.remove(os.path.join(root, name))
+
+
+# Label mappings
+
+class LabelMappings:
+    """
+    Weapon, game mode and perk labels (engineer152's wz-data) used to fill in labels missing from responses
+
+    The three files are fetched concurrently the first time a response needs them and persisted to ``directory``.
+    Persisted files younger than ``maxAge`` seconds are used as they are, older ones are revalidated with their
+    ETag/Last-Modified. A file that can't be fetched falls back to its persisted copy, or to the snapshot bundled with
+    the package when there is none.
+
+    The bundled snapshot is only a partial fallback: it was assembled from the weapon and game mode labels of this
+    repository's ``data/`` files, not from the upstream files, and has no perk labels. Until the upstream files were
+    fetched once, offline mapping fills in weapon and game mode labels only. ``partial`` tells whether the last load
+    fell back to it, such a load is retried after ``retryAfter`` seconds.
+
+    Parameters
+    ----------
+    directory: str
+        folder the fetched files are persisted in
+    maxAge: float
+        seconds a persisted file is used without revalidating it
+    retryAfter: float
+        seconds mappings that fell back to the bundled snapshot are used before they are fetched again
+    """
+    sources = {
+        "weapon-ids": "https://engineer152.github.io/wz-data/weapon-ids.json",
+        "game-modes": "https://engineer152.github.io/wz-data/game-modes.json",
+        "perks": "https://engineer152.github.io/wz-data/perks.json"
+    }
+    snapshot = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mappings.json")
+
+    def __init__(self, directory: str = os.path.join(os.path.expanduser("~"), ".cod_api", "mappings"),
+                 maxAge: float = 24 * 60 * 60, retryAfter: float = 5 * 60):
+        self.directory = directory
+        self.maxAge = maxAge
+        self.retryAfter = retryAfter
+        self.partial = False
+        self._loading = {}
+
+    async def load(self, session: "aiohttp.ClientSession") -> tuple:
+        """returns the (weapon-ids, game-modes, perks) mappings, concurrent calls share one load"""
+        loop = asyncio.get_running_loop()
+        task = self._loading.get(loop)
+        if task is None:
+            task = self._loading[loop] = loop.create_task(self.__load(session))
+            task.add_done_callback(lambda _: self._loading.pop(loop, None))
+        return await asyncio.shield(task)
+
+    async def __load(self, session) -> tuple:
+        loaded = await asyncio.gather(*[self.__fetch(session, name, url) for name, url in self.sources.items()])
+        self.partial = any(snapshot for _, snapshot in loaded)
+        return tuple(data for data, _ in loaded)
+
+    async def __fetch(self, session, name: str, url: str) -> tuple:
+        # returns the mapping and whether it comes from the bundled snapshot
+        path = os.path.join(self.directory, f"{name}.json")
+        stored = self.__read(path)
+        if stored is not None and time.time() - os.path.getmtime(path) < self.maxAge:
+            return stored["data"], False
+
+        headers = {}
+        if stored is not None and stored.get("etag"):
+            headers["If-None-Match"] = stored["etag"]
+        if stored is not None and stored.get("lastModified"):
+            headers["If-Modified-Since"] = stored["lastModified"]
+        try:
+            async with session.get(url, headers=headers) as resp:
+                if resp.status == 304 and stored is not None:
+                    os.utime(path)
+                    return stored["data"], False
+                resp.raise_for_status()
+                data = await resp.json(content_type=None)
+                _writeJson(path, {"etag": resp.headers.get("ETag"),
+                                  "lastModified": resp.headers.get("Last-Modified"),
+                                  "data": data})
+                return data, False
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, OSError):
+            if stored is not None:
+                return stored["data"], False
+            with open(self.snapshot, "r") as file:
+                return json.load(file).get(name, {}), True
+
+    @staticmethod
+    def __read(path: str):
+        try:
+            with open(path, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+
+# Label resolver
+
+class LabelResolver:
+    """
+    Fills in the labels missing from combat history matches in a single pass
+
+    The mapping files group their labels by category (e.g. "All Weapons"), they are indexed once into flat
+    name -> label tables. ``resolve`` then walks every match once and looks up primary/secondary weapons, their
+    attachments, perks and extra perks of both ``loadouts`` and ``loadout``. Existing labels are kept.
+
+    Attachments are looked up in the flattened weapon mappings, an "Attachments" category takes precedence for names
+    found in several categories.
+    """
+    dateFormat = "%A, %B %d, %Y, %I:%M:%S"
+
+    def __init__(self, weapons: dict, perks: dict):
+        self.weapons = self.index(weapons)
+        self.perks = self.index(perks)
+        attachments = weapons.get("Attachments") if isinstance(weapons, dict) else None
+        self.attachments = dict(self.weapons, **self.index(attachments)) if attachments else self.weapons
+
+    @staticmethod
+    def index(mapping) -> dict:
+        """flattens a (nested) mapping file into a name -> label table"""
+        table = {}
+        stack = [mapping] if isinstance(mapping, dict) else []
+        while stack:
+            for name, value in stack.pop().items():
+                if isinstance(value, dict):
+                    stack.append(value)
+                elif isinstance(value, str):
+                    table.setdefault(name, value)
+        return table
+
+    def resolve(self, data):
+        """maps the matches of a combat history response's data in place and returns it"""
+        if not isinstance(data, dict) or not isinstance(data.get('matches'), list):
+            return data
+        weapons, perks, attachments = self.weapons, self.perks, self.attachments
+        fromtimestamp, dateFormat = datetime.fromtimestamp, self.dateFormat
+        for match in data['matches']:
+            # time stamps
+            start, end = match.get('utcStartSeconds'), match.get('utcEndSeconds')
+            if isinstance(start, (int, float)) and isinstance(end, (int, float)):
+                match['utcStartDateTime'] = fromtimestamp(start).strftime(dateFormat)
+                match['utcEndDateTime'] = fromtimestamp(end).strftime(dateFormat)
+
+            player = match.get('player') or {}
+            for loadout in chain(player.get('loadouts') or (), player.get('loadout') or ()):
+                # weapons and their attachments
+                for slot in ('primaryWeapon', 'secondaryWeapon'):
+                    weapon = loadout.get(slot)
+                    if not weapon:
+                        continue
+                    # look the name up first, most items (e.g. empty "none" attachments) have no label to fill in
+                    name = weapon.get('name')
+                    if name in weapons and weapon.get('label') is None:
+                        weapon['label'] = weapons[name]
+                    for attachment in weapon.get('Attachments') or ():
+                        name = attachment.get('name')
+                        if name in attachments and attachment.get('label') is None:
+                            attachment['label'] = attachments[name]
+
+                # perks and extra perks
+                for perk in chain(loadout.get('perks') or (), loadout.get('extraPerks') or ()):
+                    name = perk.get('name')
+                    if name in perks and perk.get('label') is None:
+                        perk['label'] = perks[name]
+        return data
+
+
+# Metrics
+
+class Metrics:
+    """
+    Request statistics per endpoint template
+
+    Every upstream attempt records its latency (request sent until the body is read), response size and status, or
+    the type of the error when no response was received. Cacheable endpoints also count cache hits and misses.
+    Endpoints are named after their url template (``fullDataUrl``, ``friendFeedUrl``, ...).
+
+    Parameters
+    ----------
+    buckets: tuple
+        upper bounds in seconds of the latency histogram buckets
+    """
+    defaultBuckets = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets: tuple = None):
+        self.buckets = tuple(sorted(buckets)) if buckets is not None else self.defaultBuckets
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    class _Endpoint:
+        def __init__(self, buckets: int):
+            self.requests = 0
+            self.latencySum = 0.0
+            # counts per bucket, the last one collects everything above the largest bound
+            self.latencyCounts = [0] * (buckets + 1)
+            self.bytes = 0
+            self.statuses = {}
+            self.errors = {}
+            self.cacheHits = 0
+            self.cacheMisses = 0
+
+    def __endpoint(self, endpoint: str) -> _Endpoint:
+        endpoint = endpoint or "other"
+        if endpoint not in self._endpoints:
+            self._endpoints[endpoint] = self._Endpoint(len(self.buckets))
+        return self._endpoints[endpoint]
+
+    def observe(self, endpoint: str, seconds: float, status: int = None, size: int = 0, error: str = None) -> None:
+        """records one upstream attempt, ``status`` is None if no response was received"""
+        with self._lock:
+            stats = self.__endpoint(endpoint)
+            stats.requests += 1
+            stats.latencySum += seconds
+            stats.latencyCounts[next((i for i, b in enumerate(self.buckets) if seconds <= b), len(self.buckets))] += 1
+            stats.bytes += size
+            if status is not None:
+                stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            if error is not None:
+                stats.errors[error] = stats.errors.get(error, 0) + 1
+
+    def error(self, endpoint: str, error: str) -> None:
+        """records a request that failed without being sent"""
+        with self._lock:
+            errors = self.__endpoint(endpoint).errors
+            errors[error] = errors.get(error, 0) + 1
+
+    def cache(self, endpoint: str, hit: bool) -> None:
+        with self._lock:
+            stats = self.__endpoint(endpoint)
+            if hit:
+                stats.cacheHits += 1
+            else:
+                stats.cacheMisses += 1
+
+    def snapshot(self) -> dict:
+        """endpoint -> its statistics as plain data"""
+        with self._lock:
+            snapshot = {}
+            for name, stats in self._endpoints.items():
+                lookups = stats.cacheHits + stats.cacheMisses
+                snapshot[name] = {
+                    "requests": stats.requests,
+                    "latency": {
+                        "sum": stats.latencySum,
+                        "mean": stats.latencySum / stats.requests if stats.requests else None,
+                        "buckets": dict(zip([*map(str, self.buckets), "+Inf"], stats.latencyCounts))
+                    },
+                    "bytes": stats.bytes,
+                    "statuses": {str(k): v for k, v in sorted(stats.statuses.items())},
+                    "statusClasses": self.__classes(stats.statuses),
+                    "errors": dict(stats.errors),
+                    "cache": {"hits": stats.cacheHits, "misses": stats.cacheMisses,
+                              "hitRate": stats.cacheHits / lookups if lookups else None}
+                }
+            return snapshot
+
+    @staticmethod
+    def __classes(statuses: dict) -> dict:
+        classes = {}
+        for status, count in statuses.items():
+            key = f"{status // 100}xx"
+            classes[key] = classes.get(key, 0) + count
+        return dict(sorted(classes.items()))
+
+    def toJson(self, indent: int = None) -> str:
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def toPrometheus(self, prefix: str = "cod_api") -> str:
+        """the statistics in the Prometheus text exposition format"""
+        lines = []
+
+        def metric(name, kind, description, samples):
+            lines.append(f"# HELP {prefix}_{name} {description}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            lines.extend(f"{prefix}_{n}{{{','.join(f'{k}={json.dumps(v)}' for k, v in labels.items())}}} {value}"
+                         for n, labels, value in samples)
+
+        snapshot = self.snapshot()
+        metric("requests_total", "counter", "Upstream requests sent",
+               [("requests_total", {"endpoint": e}, s["requests"]) for e, s in snapshot.items()])
+        latency = []
+        for e, s in snapshot.items():
+            cumulative = 0
+            for bound, count in s["latency"]["buckets"].items():
+                cumulative += count
+                latency.append(("request_seconds_bucket", {"endpoint": e, "le": bound}, cumulative))
+            latency.append(("request_seconds_sum", {"endpoint": e}, s["latency"]["sum"]))
+            latency.append(("request_seconds_count", {"endpoint": e}, s["requests"]))
+        metric("request_seconds", "histogram", "Upstream request latency in seconds", latency)
+        metric("response_bytes_total", "counter", "Response body bytes received",
+               [("response_bytes_total", {"endpoint": e}, s["bytes"]) for e, s in snapshot.items()])
+        metric("responses_total", "counter", "Responses by status code",
+               [("responses_total", {"endpoint": e, "status": c}, n)
+                for e, s in snapshot.items() for c, n in s["statuses"].items()])
+        metric("errors_total", "counter", "Requests that got no response by error type",
+               [("errors_total", {"endpoint": e, "error": t}, n)
+                for e, s in snapshot.items() for t, n in s["errors"].items()])
+        metric("cache_lookups_total", "counter", "Response cache lookups",
+               [("cache_lookups_total", {"endpoint": e, "result": result}, s["cache"][key])
+                for e, s in snapshot.items() for result, key in (("hit", "hits"), ("miss", "misses"))
+                if s["cache"]["hits"] or s["cache"]["misses"]])
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+
+
+# Event loop
+
+class EventLoopThread:
+    """
+    Event loop running forever in a background daemon thread
+
+    Sync methods submit their coroutines to it instead of creating and tearing down a new loop with ``asyncio.run``
+    on every call, so the pooled session bound to this loop is reused between sync calls. The thread is started on
+    first use.
+    """
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None
+
+    def __start(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=self.__serve, args=(loop,), name="cod_api-loop", daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    @staticmethod
+    async def __cancelTasks() -> None:
+        # requests still running in the background, e.g. shared ones whose callers stopped waiting
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    @staticmethod
+    async def __spawn(coro, finished: threading.Event) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        task.add_done_callback(lambda _: finished.set())
+        return task
+
+    @staticmethod
+    def __serve(loop: asyncio.AbstractEventLoop) -> None:
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    def run(self, coro):
+        """
+        runs the coroutine on the background loop and blocks until its result is available
+
+        If the caller is interrupted, e.g. by Ctrl+C, the coroutine is cancelled and has unwound before the exception
+        is raised again.
+        """
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("sync methods can't be called from the background event loop, use the async methods")
+        loop = self.__start()
+        finished = threading.Event()
+        task = asyncio.run_coroutine_threadsafe(self.__spawn(coro, finished), loop).result()
+        try:
+            finished.wait()
+            return task.result()
+        except BaseException:
+            loop.call_soon_threadsafe(task.cancel)
+            finished.wait()
+            raise
+
+    def stop(self) -> None:
+        """stops the loop and joins its thread, a later ``run`` starts a new one"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.__cancelTasks(), loop).result()
+        asyncio.run_coroutine_threadsafe(loop.shutdown_asyncgens(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
 class API:
     """
     Call Of Duty API Wrapper
@@ -53,25 +1227,182 @@ class API:
     - Werseter
 
     Source Code: https://github.com/TodoLodo/cod-python-api
+
+    Parameters
+    ----------
+    pool: SessionPool
+        connection pool used for all requests, a default pool is created if not given
+    rateLimiter: RateLimiter
+        throttles requests per endpoint family, a limiter with ``RateLimiter.defaultRates`` is created if not given
+    retry: RetryPolicy
+        retries transient failures, ``RetryPolicy()`` if not given
+    circuitBreaker: CircuitBreaker
+        stops sending requests to a host that keeps failing, ``CircuitBreaker()`` if not given
+    cache: ResponseCache
+        serves repeated requests from disk, responses are not cached if not given
+    tokenPool: TokenPool
+        spreads game data requests over the accounts logged in with ``loginPool``, ``TokenPool()`` if not given
+    loginCache: LoginCache
+        persists validated logins so later runs skip the validation request, logins are not persisted if not given
+    metrics: Metrics
+        collects request statistics per endpoint, ``Metrics()`` if not given, available as ``api.metrics``
+    baseUrl: str
+        root of the profile API, e.g. a local stand-in server, ``https://profile.callofduty.com/api/papi-client``
+        if not given
+    userInfo: UserInfoFile
+        where ``Me`` reads the logged in user's identities from, ``userInfo.json`` in the working directory if not
+        given
+
+    Sync methods run on a background event loop owned by the object, call ``close()`` (or use it as a context
+    manager) to release its connections and stop the loop. Login state and cookies belong to the object, several
+    objects can be logged in with different tokens at the same time.
     """
-    def __init__(self):
-        # sub classes
-        self.Warzone = self.__WZ()
-        self.ModernWarfare = self.__MW()
-        self.Warzone2 = self.__WZ2()
-        self.ModernWarfare2 = self.__MW2()
-        self.ColdWar = self.__CW()
-        self.Vanguard = self.__VG()
-        self.Shop = self.__SHOP()
-        self.Me = self.__USER()
-        self.Misc = self.__ALT()
-
-    async def loginAsync(self, sso_token: str) -> None:
-        await API._Common.loginAsync(sso_token)
+    # sub classes
+    Warzone = _SubClient("_API__WZ")
+    ModernWarfare = _SubClient("_API__MW")
+    Warzone2 = _SubClient("_API__WZ2")
+    ModernWarfare2 = _SubClient("_API__MW2")
+    ColdWar = _SubClient("_API__CW")
+    Vanguard = _SubClient("_API__VG")
+    Shop = _SubClient("_API__SHOP")
+    Me = _SubClient("_API__USER")
+    Misc = _SubClient("_API__ALT")
+
+    def __init__(self, pool: SessionPool = None, rateLimiter: RateLimiter = None, retry: RetryPolicy = None,
+                 circuitBreaker: CircuitBreaker = None, cache: ResponseCache = None, tokenPool: TokenPool = None,
+                 loginCache: LoginCache = None, metrics: Metrics = None, baseUrl: str = None,
+                 userInfo: UserInfoFile = None):
+        self._pool = pool if pool is not None else SessionPool()
+        self._limiter = rateLimiter if rateLimiter is not None else RateLimiter()
+        self._retry = retry if retry is not None else RetryPolicy()
+        self._breaker = circuitBreaker if circuitBreaker is not None else CircuitBreaker()
+        self._cache = cache
+        self._tokens = tokenPool if tokenPool is not None else TokenPool()
+        self._logins = loginCache
+        self.metrics = metrics if metrics is not None else Metrics()
+        self._baseUrl = baseUrl
+        self._userInfo = userInfo if userInfo is not None else UserInfoFile()
+        self._inflight = {}
+        self._loop = EventLoopThread()
+        self._account = Account()
+
+    async def loginAsync(self, sso_token: str, lazy: bool = False) -> None:
+        await self.Me.loginAsync(sso_token, lazy)
 
     # Login
-    def login(self, ssoToken: str):
-        API._Common.login(ssoToken)
+    def login(self, ssoToken: str, lazy: bool = False):
+        """
+        Logs in with an SSO token
+
+        lazy: don't validate the token until the first request needs it, so runs that don't touch the network don't
+            wait for the identities endpoint. An invalid token then raises ``InvalidToken`` from that request.
+
+        A token the identities endpoint can't check (no response, 429 or 5xx) isn't treated as invalid: ``login``
+        raises ``StatusError``, a lazy login returns the error response from the request, and the token is validated
+        again by the next request.
+        """
+        self.Me.login(ssoToken, lazy)
+
+    async def loginPoolAsync(self, ssoTokens) -> list:
+        """
+        Logs in with several SSO tokens and adds the valid ones to the token pool, returns the tokens that were
+        rejected or couldn't be checked
+
+        Requests for game data are spread over the pooled accounts, requests about the logged in user (``Me``)
+        keep using the client's own account. The first valid token becomes the client's own account if it isn't
+        logged in yet.
+        """
+        accounts = [Account(token) for token in dict.fromkeys(ssoTokens)]
+        results = await asyncio.gather(*(self.Me._Common__validate(a) for a in accounts))
+        valid = [ok for ok, _ in results]
+        for account, ok in zip(accounts, valid):
+            if ok:
+                self._tokens.add(account)
+                if not self._account.loggedIn:
+                    self._account = account
+        if not any(valid):
+            # InvalidToken only if every token was actually rejected, not when the endpoint couldn't answer
+            if None in valid:
+                raise StatusError
+            raise InvalidToken(", ".join(a.ssoToken for a in accounts))
+        return [a.ssoToken for a, ok in zip(accounts, valid) if not ok]
+
+    def loginPool(self, ssoTokens) -> list:
+        return self.run(self.loginPoolAsync(ssoTokens))
+
+    @property
+    def loggedIn(self) -> bool:
+        return self._account.loggedIn
+
+    def tokenStats(self) -> dict:
+        """requests sent, error rate and remaining cooldown of each pooled token"""
+        return self._tokens.stats()
+
+    # Batch
+    async def iterManyAsync(self, batch, limit: int = 10):
+        """
+        Runs many player requests concurrently and yields ``(request, result)`` pairs as each one completes
+
+        batch: iterable of ``BatchRequest`` or (title, endpoint, platform, gamertag) tuples, e.g.
+            ``(games.ModernWarfare, "fullData", platforms.Activision, "Username#1234567")``
+        limit: maximum number of requests in flight at once
+
+        A failing request yields an error result of the usual ``{'status': 'error', ...}`` form and does not
+        cancel the others.
+        """
+        semaphore = asyncio.Semaphore(limit)
+
+        async def fetch(request):
+            async with semaphore:
+                return request, await self.__fetchOne(request)
+
+        tasks = [asyncio.ensure_future(fetch(r)) for r in dict.fromkeys(BatchRequest(*r) for r in batch)]
+        try:
+            for completed in asyncio.as_completed(tasks):
+                yield await completed
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def fetchManyAsync(self, batch, limit: int = 10) -> dict:
+        """same as ``iterManyAsync`` but returns all results as a dict keyed by ``BatchRequest``"""
+        return {request: result async for request, result in self.iterManyAsync(batch, limit)}
+
+    def fetchMany(self, batch, limit: int = 10) -> dict:
+        return self.run(self.fetchManyAsync(batch, limit))
+
+    async def __fetchOne(self, request: BatchRequest):
+        try:
+            client = getattr(self, request.title.name)
+            return await getattr(client, f"{request.endpoint}Async")(request.platform, request.gamertag)
+        except Exception as err:
+            return {'status': 'error', 'data': {'type': type(err), 'message': str(err)}}
+
+    # Event loop
+    def run(self, coro):
+        """runs a coroutine on the background event loop shared by all sync methods and returns its result"""
+        return self._loop.run(coro)
+
+    # Pool
+    async def closeAsync(self) -> None:
+        await self._pool.close()
+
+    def close(self) -> None:
+        if self._loop.running:
+            self._loop.run(self._pool.close())
+            self._loop.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.closeAsync()
 
     class _Common:
         requestHeaders = {
@@ -83,13 +1414,18 @@ class API:
             "Accept": "application/json",
             "Connection": "Keep-Alive"
         }
-        cookies = {"new_SiteId": "cod", "ACT_SSO_LOCALE": "en_US", "country": "US",
-                   "ACT_SSO_COOKIE_EXPIRY": "1645556143194"}
+        # shared by every API object, the labels don't depend on the account
+        labelMappings = LabelMappings()
         cachedMappings = None
+        # time.time() the cached resolver is rebuilt at, to revalidate the mappings or retry a fallback
+        cachedMappingsExpire = 0
 
-        fakeXSRF = str(uuid.uuid4())
+        fakeXSRF = _Once(lambda: str(uuid.uuid4()))
         baseUrl: str = "https://profile.callofduty.com/api/papi-client"
-        loggedIn: bool = False
+        # requests of the sub class may be sent with any account of the token pool
+        _pooled: bool = True
+        # seconds after its end a combatHistory/breakdown time window may still gain matches and isn't cached
+        openWindow: int = 60 * 60
 
         # endPoints
 
@@ -105,63 +1441,228 @@ class API:
         mapListUrl = "/ce/v1/title/%s/platform/%s/gameType/mp/communityMapData/availability"
         # game platform type matchId
         matchInfoUrl = "/crm/cod/v2/title/%s/platform/%s/fullMatch/%s/%d/en"
+        # ssoToken
+        identitiesUrl = "/crm/cod/v2/identities/%s"
 
-        @staticmethod
-        async def loginAsync(sso_token: str) -> None:
-            API._Common.cookies["ACT_SSO_COOKIE"] = sso_token
-            API._Common.baseSsoToken = sso_token
-            r = await API._Common.__Request(f"{API._Common.baseUrl}/crm/cod/v2/identities/{sso_token}")
-            if r['status'] == 'success':
-                API._Common.loggedIn = True
-            else:
-                raise InvalidToken(sso_token)
-
-        @staticmethod
-        def login(sso_token: str) -> None:
-            API._Common.cookies["ACT_SSO_COOKIE"] = sso_token
-            API._Common.baseSsoToken = sso_token
+        def __init__(self, api):
+            self._api = api
+            if api._baseUrl is not None:
+                self.baseUrl = api._baseUrl.rstrip("/")
 
-            r = requests.get(f"{API._Common.baseUrl}/crm/cod/v2/identities/{sso_token}",
-                             headers=API._Common.requestHeaders, cookies=API._Common.cookies)
-
-            if r.json()['status'] == 'success':
-                API._Common.loggedIn = True
-                API._Common.cookies.update(r.cookies)
+        @property
+        def loggedIn(self) -> bool:
+            return self._api._account.loggedIn
+
+        async def loginAsync(self, sso_token: str, lazy: bool = False) -> None:
+            if not self.__prepareLogin(sso_token, lazy) and await self.__login(self._api._account) is not None:
+                # the token couldn't be checked, it is validated again by the first request
+                raise StatusError
+
+        def login(self, sso_token: str, lazy: bool = False) -> None:
+            if not self.__prepareLogin(sso_token, lazy) and self._run(self.__login(self._api._account)) is not None:
+                raise StatusError
+
+        def __prepareLogin(self, sso_token: str, lazy: bool) -> bool:
+            # sets the token, returns True if it doesn't have to be validated now
+            account = self._api._account
+            account.setToken(sso_token)
+            logins = self._api._logins
+            cookies = logins.get(sso_token) if logins is not None else None
+            if cookies is not None:
+                account.cookies.update(cookies)
+                account.loggedIn = True
+                self._api._tokens.add(account)
+                return True
+            account.pending = lazy
+            return lazy
+
+        async def __login(self, account: Account):
+            # returns None once the token is validated, or the error response if the identities endpoint couldn't
+            # answer, the token then stays pending and the next request validates it again
+            logins = self._api._logins
+            valid, response = await self.__validate(account)
+            if valid is None:
+                account.pending = True
+                return response
+            account.pending = False
+            if valid:
+                self._api._tokens.add(account)
+                if logins is not None:
+                    logins.set(account.ssoToken, account.cookies)
             else:
-                raise InvalidToken(sso_token)
-
-        @staticmethod
-        def sso_token() -> str:
-            return API._Common.cookies["ACT_SSO_COOKIE"]
+                self._api._tokens.remove(account)
+                if logins is not None:
+                    logins.forget(account.ssoToken)
+                raise InvalidToken(account.ssoToken)
+
+        async def __ensureLogin(self):
+            # validates a lazily given token, concurrent first requests wait for the same validation; returns the
+            # error response if the token couldn't be checked
+            account = self._api._account
+            if not account.pending:
+                return None
+            loop = asyncio.get_running_loop()
+            key = (loop, "login", account.ssoToken)
+            flights = self._api._inflight
+            flight = flights.get(key)
+            if flight is None:
+                flight = loop.create_task(self.__login(account))
+                flights[key] = flight
+                flight.add_done_callback(lambda _: flights.pop(key, None))
+            return await asyncio.shield(flight)
+
+        def sso_token(self) -> str:
+            return self._api._account.ssoToken
 
         # Requests
 
-        @staticmethod
-        async def __Request(url):
-            async with aiohttp.client.ClientSession(connector=aiohttp.TCPConnector(verify_ssl=True),
-                                                    timeout=aiohttp.ClientTimeout(total=30)) as session:
-                try:
-                    async with session.get(url, cookies=API._Common.cookies,
-                                           headers=API._Common.requestHeaders) as resp:
-                        try:
-                            resp.raise_for_status()
-                        except ClientResponseError as err:
-                            return {'status': 'error', 'data': {'type': type(err), 'message': err.message}}
-                        else:
-                            API._Common.cookies.update({c.key: c.value for c in session.cookie_jar})
-                            return await resp.json()
-                except asyncio.TimeoutError as err:
-                    return {'status': 'error', 'data': {'type': type(err), 'message': str(err)}}
-
-        async def __sendRequest(self, url: str):
+        def _run(self, coro):
+            return self._api.run(coro)
+
+        async def __validate(self, account: Account) -> tuple:
+            # checks the account's token against the identities endpoint, returns (valid, response) where valid is
+            # True, False if the token was rejected or None if it couldn't be checked (no response, 429 or 5xx)
+            response, status = await self.__exchange(f"{self.baseUrl}{self.identitiesUrl % account.ssoToken}", "crm",
+                                                     account, "identitiesUrl")
+            if response['status'] == 'success':
+                valid = True
+            elif status is None or status == 429 or status >= 500:
+                return None, response
+            else:
+                valid = False
+            account.loggedIn = valid
+            return valid, response
+
+        async def __revalidate(self):
+            # pooled accounts that got a 401/403 are validated again, the rejected ones are dropped and the ones that
+            # couldn't be checked are flagged again after a cooldown
+            pool, logins = self._api._tokens, self._api._logins
+            for account in pool.suspects():
+                valid, _ = await self.__validate(account)
+                if valid is None:
+                    pool.flag(account)
+                elif not valid:
+                    pool.remove(account)
+                    if logins is not None:
+                        logins.forget(account.ssoToken)
+
+        def __account(self) -> Account:
+            if self._pooled:
+                account = self._api._tokens.pick()
+                if account is not None:
+                    return account
+            return self._api._account
+
+        async def __Request(self, url, family=None, account=None, endpoint=None):
+            # family: RateLimiter endpoint family, requests outside the profile API are not throttled
+            # account: whose cookies are sent, an account is picked for every attempt if not given
+            # endpoint: name of the url template the request's metrics are recorded under
+            response, _ = await self.__exchange(url, family, account, endpoint)
+            return response
+
+        async def __exchange(self, url, family=None, account=None, endpoint=None):
+            # __Request that also returns the status of the last attempt, None if no response was received
+            retry, breaker = self._api._retry, self._api._breaker
+            host = urlsplit(url).netloc
+            delays = retry.delays()
+            for attempt in range(1, retry.attempts + 1):
+                if not breaker.allow(host):
+                    err = CircuitOpen(host)
+                    self._api.metrics.error(endpoint, type(err).__name__)
+                    return {'status': 'error', 'data': {'type': type(err), 'message': str(err)}}, None
+                current = account if account is not None else self.__account()
+                response, status = await self.__attempt(url, family, current, endpoint)
+                if status is None or status >= 500:
+                    breaker.failure(host)
+                else:
+                    breaker.success(host)
+                if (status in (401, 403) and account is None and self._pooled and len(self._api._tokens) > 1
+                        and attempt < retry.attempts):
+                    # the token may have expired, another pooled account can answer right away
+                    continue
+                if (status is not None and status < 400) or not retry.retryable(status) or attempt == retry.attempts:
+                    return response, status
+                await asyncio.sleep(next(delays))
+
+        async def __attempt(self, url, family, account, endpoint=None):
+            # returns the response and its status, the status is None if no response was received
+            session = self._api._pool.get()
+            limiter, pool, metrics = self._api._limiter, self._api._tokens, self._api.metrics
+            trace = RequestTrace(url) if self._api._pool.tracing else None
+            started = None
+            try:
+                cooldown = pool.wait(account)
+                if cooldown > 0:
+                    await asyncio.sleep(cooldown)
+                if family is not None:
+                    # limits apply per account, every token has its own buckets
+                    await limiter.acquire(family, account.ssoToken)
+                started = time.perf_counter()
+                async with session.get(url, cookies=account.cookies, headers=API._Common.requestHeaders,
+                                       trace_request_ctx=trace) as resp:
+                    retryAfter = resp.headers.get("Retry-After")
+                    pool.report(account, resp.status, retryAfter)
+                    if family is not None:
+                        limiter.feedback(family, resp.status, retryAfter, account.ssoToken)
+                    try:
+                        resp.raise_for_status()
+                    except aiohttp.ClientResponseError as err:
+                        metrics.observe(endpoint, time.perf_counter() - started, resp.status, resp.content_length or 0)
+                        self.__emit(trace, resp.status)
+                        return {'status': 'error', 'data': {'type': type(err), 'message': err.message}}, resp.status
+                    else:
+                        account.cookies.update({k: m.value for k, m in resp.cookies.items()})
+                        body = await resp.read()
+                        metrics.observe(endpoint, time.perf_counter() - started, resp.status, len(body))
+                        self.__emit(trace, resp.status)
+                        return await resp.json(), resp.status
+            except (asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError) as err:
+                if started is not None:
+                    metrics.observe(endpoint, time.perf_counter() - started, error=type(err).__name__)
+                    self.__emit(trace, error=type(err).__name__)
+                return {'status': 'error', 'data': {'type': type(err), 'message': str(err)}}, None
+
+        def __emit(self, trace, status=None, error=None):
+            if trace is not None:
+                trace.finish(status, error)
+                self._api._pool.emit(trace)
+
+        async def __sendRequest(self, url: str, endpoint: str = None, cache: bool = True):
+            # endpoint: name of the url template, used to look up the response's TTL in the cache
+            # cache: False bypasses the response cache, the response is neither read from nor stored in it
+            error = await self.__ensureLogin()
+            if error is not None:
+                return error
             if self.loggedIn:
-                response = await API._Common.__Request(f"{self.baseUrl}{url}")
-                if response['status'] == 'success':
-                    response['data'] = await self.__perform_mapping(response['data'])
-                return response
+                # concurrent identical requests share one upstream call (and its response object)
+                loop = asyncio.get_running_loop()
+                key = (loop, f"{self.baseUrl}{url}", self.sso_token(), cache)
+                flights = self._api._inflight
+                flight = flights.get(key)
+                if flight is None:
+                    flight = loop.create_task(self.__fetch(url, endpoint, cache))
+                    flights[key] = flight
+                    flight.add_done_callback(lambda _: flights.pop(key, None))
+                return await asyncio.shield(flight)
             else:
                 raise NotLoggedIn
 
+        async def __fetch(self, url: str, endpoint: str = None, cached: bool = True):
+            fullUrl = f"{self.baseUrl}{url}"
+            cache = self._api._cache if cached else None
+            response = None
+            if cache is not None and endpoint is not None and cache.caches(endpoint):
+                response = cache.get(endpoint, fullUrl, self.sso_token())
+                self._api.metrics.cache(endpoint, response is not None)
+            if response is None:
+                response = await self.__Request(fullUrl, RateLimiter.family(url), endpoint=endpoint)
+                await self.__revalidate()
+                if cache is not None and endpoint is not None and response['status'] == 'success':
+                    cache.set(endpoint, fullUrl, self.sso_token(), response)
+            if response['status'] == 'success':
+                response['data'] = await self.__perform_mapping(response['data'])
+            return response
+
         # client name url formatter
         def __cleanClientName(self, gamertag):
             return quote(gamertag.encode("utf-8"))
@@ -180,118 +1681,57 @@ class API:
                 gamertag = self.__cleanClientName(gamertag)
             return lookUpType, gamertag, platform
 
-        async def __get_mappings(self):
-            if API._Common.cachedMappings is None:
-                API._Common.cachedMappings = (
-                    await API._Common.__Request('https://engineer152.github.io/wz-data/weapon-ids.json'),
-                    await API._Common.__Request('https://engineer152.github.io/wz-data/game-modes.json'),
-                    await API._Common.__Request('https://engineer152.github.io/wz-data/perks.json'))
+        async def __get_mappings(self) -> LabelResolver:
+            if API._Common.cachedMappings is None or time.time() >= API._Common.cachedMappingsExpire:
+                mappings = API._Common.labelMappings
+                guns, modes, perks = await mappings.load(self._api._pool.get())
+                API._Common.cachedMappings = LabelResolver(guns, perks)
+                API._Common.cachedMappingsExpire = time.time() + (mappings.retryAfter if mappings.partial
+                                                                   else mappings.maxAge)
             return API._Common.cachedMappings
 
         # mapping
         async def __perform_mapping(self, data):
-            guns, modes, perks = await self.__get_mappings()
-            if not isinstance(data, list) or 'matches' not in data:
+            # only load the mappings once a response actually has matches to map
+            if not isinstance(data, dict) or 'matches' not in data:
                 return data
-            try:
-                for match in data['matches']:
-                    # time stamps
-                    try:
-                        match['utcStartDateTime'] = datetime.fromtimestamp(
-                            match['utcStartSeconds']).strftime("%A, %B %d, %Y, %I:%M:%S")
-                        match['utcEndDateTime'] = datetime.fromtimestamp(
-                            match['utcEndSeconds']).strftime("%A, %B %d, %Y, %I:%M:%S")
-                    except KeyError:
-                        pass
-
-                    # loadouts list
-                    for loadout in match['player']['loadouts']:
-                        # weapons
-                        if loadout['primaryWeapon']['label'] is None:
-                            try:
-                                loadout['primaryWeapon']['label'] = guns[loadout['primaryWeapon']['name']]
-                            except KeyError:
-                                pass
-                        if loadout['secondaryWeapon']['label'] is None:
-                            try:
-                                loadout['secondaryWeapon']['label'] = guns[loadout['secondaryWeapon']['name']]
-                            except KeyError:
-                                pass
-
-                        # perks list
-                        for perk in loadout['perks']:
-                            if perk['label'] is None:
-                                try:
-                                    perk['label'] = perks[perk['name']]
-                                except KeyError:
-                                    pass
-
-                        # extra perks list
-                        for perk in loadout['extraPerks']:
-                            if perk['label'] is None:
-                                try:
-                                    perk['label'] = perks[perk['name']]
-                                except KeyError:
-                                    pass
-
-                    # loadout list
-                    for loadout in match['player']['loadout']:
-                        if loadout['primaryWeapon']['label'] is None:
-                            try:
-                                loadout['primaryWeapon']['label'] = guns[loadout['primaryWeapon']['name']]
-                            except KeyError:
-                                pass
-                        if loadout['secondaryWeapon']['label'] is None:
-                            try:
-                                loadout['secondaryWeapon']['label'] = guns[loadout['secondaryWeapon']['name']]
-                            except KeyError:
-                                pass
-
-                            # perks list
-                            for perk in loadout['perks']:
-                                if perk['label'] is None:
-                                    try:
-                                        perk['label'] = perks[perk['name']]
-                                    except KeyError:
-                                        pass
-
-                            # extra perks list
-                            for perk in loadout['extraPerks']:
-                                if perk['label'] is None:
-                                    try:
-                                        perk['label'] = perks[perk['name']]
-                                    except KeyError:
-                                        pass
-            except KeyError:
-                pass
-
+            resolver = await self.__get_mappings()
             # return mapped or unmapped data
-            return data
+            return resolver.resolve(data)
 
         # API Requests
         async def _fullDataReq(self, game, platform, gamertag, type):
             lookUpType, gamertag, platform = self.__helper(platform, gamertag)
-            return await self.__sendRequest(self.fullDataUrl % (game, platform.value, lookUpType, gamertag, type))
+            return await self.__sendRequest(self.fullDataUrl % (game, platform.value, lookUpType, gamertag, type),
+                                            "fullDataUrl")
 
-        async def _combatHistoryReq(self, game, platform, gamertag, type, start, end):
+        async def _combatHistoryReq(self, game, platform, gamertag, type, start, end, cache=True):
             lookUpType, gamertag, platform = self.__helper(platform, gamertag)
             return await self.__sendRequest(
-                self.combatHistoryUrl % (game, platform.value, lookUpType, gamertag, type, start, end))
+                self.combatHistoryUrl % (game, platform.value, lookUpType, gamertag, type, start, end),
+                "combatHistoryUrl", cache and self.__closedWindow(end))
 
         async def _breakdownReq(self, game, platform, gamertag, type, start, end):
             lookUpType, gamertag, platform = self.__helper(platform, gamertag)
             return await self.__sendRequest(
-                self.breakdownUrl % (game, platform.value, lookUpType, gamertag, type, start, end))
+                self.breakdownUrl % (game, platform.value, lookUpType, gamertag, type, start, end), "breakdownUrl",
+                self.__closedWindow(end))
+
+        def __closedWindow(self, end: int) -> bool:
+            # a time window (epoch milliseconds) is only cached once no match can be added to it anymore, matches are
+            # listed by their start once they have finished. 0 is the latest page, its url doesn't change over time.
+            return end == 0 or end < (time.time() - self.openWindow) * 1000
 
         async def _seasonLootReq(self, game, platform, gamertag):
             lookUpType, gamertag, platform = self.__helper(platform, gamertag)
-            return await self.__sendRequest(self.seasonLootUrl % (game, platform.value, lookUpType, gamertag))
+            return await self.__sendRequest(self.seasonLootUrl % (game, platform.value, lookUpType, gamertag),
+                                            "seasonLootUrl")
 
         async def _mapListReq(self, game, platform):
-            return await self.__sendRequest(self.mapListUrl % (game, platform.value))
+            return await self.__sendRequest(self.mapListUrl % (game, platform.value), "mapListUrl")
 
         async def _matchInfoReq(self, game, platform, type, matchId):
-            return await self.__sendRequest(self.matchInfoUrl % (game, platform.value, type, matchId))
+            return await self.__sendRequest(self.matchInfoUrl % (game, platform.value, type, matchId), "matchInfoUrl")
 
     class __GameDataCommons(_Common):
         """
@@ -302,8 +1742,8 @@ class API:
         fullData(platform:platforms, gamertag:str)
             returns player's game data of type dict
 
-        combatHistory(platform:platforms, gamertag:str)
-            returns player's combat history of type dict
+        combatHistory(platform:platforms, gamertag:str, cache:bool)
+            returns player's combat history of type dict, ``cache=False`` bypasses the response cache
 
         combatHistoryWithDate(platform:platforms, gamertag:str, start:int, end:int)
             returns player's combat history within the specified timeline of type dict
@@ -323,13 +1763,19 @@ class API:
         matchInfo(platform:platforms, matchId:int)
                     returns details match details of type dict
 
+        matchHistory(platform:platforms, gamertag:str, cursor:HistoryCursor)
+            returns player's full match history as a list of matches, newest first
+
+        matchInfoMany(platform:platforms, matchIds:iterable, store:set)
+            returns details of many matches of type dict keyed by match id
+
         Async
         ----
         fullDataAsync(platform:platforms, gamertag:str)
             returns player's game data of type dict
 
-        combatHistoryAsync(platform:platforms, gamertag:str)
-            returns player's combat history of type dict
+        combatHistoryAsync(platform:platforms, gamertag:str, cache:bool)
+            returns player's combat history of type dict, ``cache=False`` bypasses the response cache
 
         combatHistoryWithDateAsync(platform:platforms, gamertag:str, start:int, end:int)
             returns player's combat history within the specified timeline of type dict
@@ -348,8 +1794,17 @@ class API:
 
         matchInfoAsync(platform:platforms, matchId:int)
                     returns details match details of type dict
+
+        matchHistoryAsync(platform:platforms, gamertag:str, cursor:HistoryCursor)
+            async generator yielding player's full match history match by match, newest first
+
+        matchInfoManyAsync(platform:platforms, matchIds:iterable, store:set)
+            returns details of many matches of type dict keyed by match id
         """
 
+        # number of matches combat history returns at most per request
+        _pageSize = 20
+
         def __init_subclass__(cls, **kwargs):
             cls.__doc__ = cls.__doc__ + super(cls, cls).__doc__
 
@@ -368,56 +1823,154 @@ class API:
             return data
 
         def fullData(self, platform: platforms, gamertag: str):
-            return asyncio.run(self.fullDataAsync(platform, gamertag))
+            return self._run(self.fullDataAsync(platform, gamertag))
 
-        async def combatHistoryAsync(self, platform: platforms, gamertag: str):
-            data = await self._combatHistoryReq(self._game, platform, gamertag, self._type, 0, 0)
+        async def combatHistoryAsync(self, platform: platforms, gamertag: str, cache: bool = True):
+            data = await self._combatHistoryReq(self._game, platform, gamertag, self._type, 0, 0, cache)
             return data
 
-        def combatHistory(self, platform: platforms, gamertag: str):
-            return asyncio.run(self.combatHistoryAsync(platform, gamertag))
+        def combatHistory(self, platform: platforms, gamertag: str, cache: bool = True):
+            return self._run(self.combatHistoryAsync(platform, gamertag, cache))
 
-        async def combatHistoryWithDateAsync(self, platform, gamertag: str, start: int, end: int):
-            data = await self._combatHistoryReq(self._game, platform, gamertag, self._type, start, end)
+        async def combatHistoryWithDateAsync(self, platform, gamertag: str, start: int, end: int, cache: bool = True):
+            data = await self._combatHistoryReq(self._game, platform, gamertag, self._type, start, end, cache)
             return data
 
-        def combatHistoryWithDate(self, platform, gamertag: str, start: int, end: int):
-            return asyncio.run(self.combatHistoryWithDateAsync(platform, gamertag, start, end))
+        def combatHistoryWithDate(self, platform, gamertag: str, start: int, end: int, cache: bool = True):
+            return self._run(self.combatHistoryWithDateAsync(platform, gamertag, start, end, cache))
 
         async def breakdownAsync(self, platform, gamertag: str):
             data = await self._breakdownReq(self._game, platform, gamertag, self._type, 0, 0)
             return data
 
         def breakdown(self, platform, gamertag: str):
-            return asyncio.run(self.breakdownAsync(platform, gamertag))
+            return self._run(self.breakdownAsync(platform, gamertag))
 
         async def breakdownWithDateAsync(self, platform, gamertag: str, start: int, end: int):
             data = await self._breakdownReq(self._game, platform, gamertag, self._type, start, end)
             return data
 
         def breakdownWithDate(self, platform, gamertag: str, start: int, end: int):
-            return asyncio.run(self.breakdownWithDateAsync(platform, gamertag, start, end))
+            return self._run(self.breakdownWithDateAsync(platform, gamertag, start, end))
 
         async def matchInfoAsync(self, platform, matchId: int):
             data = await self._matchInfoReq(self._game, platform, self._type, matchId)
             return data
 
         def matchInfo(self, platform, matchId: int):
-            return asyncio.run(self.matchInfoAsync(platform, matchId))
+            return self._run(self.matchInfoAsync(platform, matchId))
+
+        async def matchInfoManyAsync(self, platform, matchIds, store=None, limit: int = 10) -> dict:
+            """
+            Fetches the details of many matches concurrently, at most ``limit`` at a time
+
+            Duplicate ids are fetched once and ids already ``in store`` are skipped, the ids of successfully fetched
+            matches are added to ``store`` if it has an ``add`` method. Passing the same store (e.g. a set) for every
+            tracked player fetches a lobby shared by several of them only once. Concurrent requests for the same match
+            share one upstream call as well.
+            """
+            semaphore = asyncio.Semaphore(limit)
+
+            async def fetch(matchId):
+                async with semaphore:
+                    try:
+                        return matchId, await self.matchInfoAsync(platform, int(matchId))
+                    except Exception as err:
+                        return matchId, {'status': 'error', 'data': {'type': type(err), 'message': str(err)}}
+
+            ids = [matchId for matchId in dict.fromkeys(matchIds) if store is None or matchId not in store]
+            results = dict(await asyncio.gather(*[fetch(matchId) for matchId in ids]))
+            if hasattr(store, "add"):
+                for matchId, response in results.items():
+                    if response['status'] == 'success':
+                        store.add(matchId)
+            return results
+
+        def matchInfoMany(self, platform, matchIds, store=None, limit: int = 10) -> dict:
+            return self._run(self.matchInfoManyAsync(platform, matchIds, store, limit))
 
         async def seasonLootAsync(self, platform, gamertag):
             data = await self._seasonLootReq(self._game, platform, gamertag)
             return data
 
         def seasonLoot(self, platform, gamertag):
-            return asyncio.run(self.seasonLootAsync(platform, gamertag))
+            return self._run(self.seasonLootAsync(platform, gamertag))
 
         async def mapListAsync(self, platform):
             data = await self._mapListReq(self._game, platform)
             return data
 
         def mapList(self, platform):
-            return asyncio.run(self.mapListAsync(platform))
+            return self._run(self.mapListAsync(platform))
+
+        async def matchHistoryAsync(self, platform, gamertag: str, cursor: HistoryCursor = None,
+                                    window: int = 14 * 24 * 60 * 60 * 1000, concurrency: int = 4,
+                                    emptyWindows: int = 26, since: int = 0, cache: bool = True):
+            """
+            Walks a player's match history backwards in time and yields every match, newest first
+
+            History is split into ``window`` milliseconds long time windows, up to ``concurrency`` of them are
+            requested at once with ``combatHistoryWithDateAsync``. A window holding more than one page of matches is
+            paged further back from the ``utcStartSeconds`` of its oldest match. The crawl ends after
+            ``emptyWindows`` consecutive windows without matches or once ``since`` (epoch milliseconds) is reached.
+
+            ``cursor`` is advanced after every completed window, a saved cursor resumes the crawl where it stopped
+            (matches of a window that was only partly consumed are yielded again). Raises StatusError if a window
+            can't be fetched, the cursor then still points at the failed window. ``cache=False`` fetches every window
+            past the response cache, e.g. when polling for new matches.
+            """
+            cursor = cursor if cursor is not None else HistoryCursor()
+            if cursor.end is None:
+                cursor.end = int(time.time() * 1000)
+            pending = deque()
+            nextEnd = cursor.end
+            empty = 0
+            try:
+                while not cursor.done:
+                    # keep the next windows in flight while the oldest one is consumed
+                    while len(pending) < concurrency and nextEnd > since:
+                        start = max(since, nextEnd - window)
+                        # windows share their boundary, a match exactly on it belongs to the newer window
+                        task = asyncio.ensure_future(
+                            self.__historyWindow(platform, gamertag, start, nextEnd - 1, cache))
+                        pending.append((start, task))
+                        nextEnd = start
+                    if not pending:
+                        cursor.done = True
+                        break
+
+                    start, task = pending.popleft()
+                    matches = await task
+                    for match in matches:
+                        yield match
+                    cursor.end = start
+                    empty = 0 if matches else empty + 1
+                    if empty >= emptyWindows or cursor.end <= since:
+                        cursor.done = True
+            finally:
+                for _, task in pending:
+                    task.cancel()
+
+        async def __historyWindow(self, platform, gamertag: str, start: int, end: int, cache: bool) -> list:
+            matches, seen = [], set()
+            while True:
+                response = await self.combatHistoryWithDateAsync(platform, gamertag, start, end, cache)
+                if response['status'] != 'success':
+                    raise StatusError
+                page = response['data'].get('matches') or []
+                # the oldest match of a page is also the newest of the next one
+                new = [match for match in page if match['matchID'] not in seen]
+                seen.update(match['matchID'] for match in new)
+                matches.extend(new)
+                if len(page) < self._pageSize or not new:
+                    return matches
+                end = min(match['utcStartSeconds'] for match in page) * 1000
+
+        def matchHistory(self, platform, gamertag: str, cursor: HistoryCursor = None, **kwargs) -> list:
+            async def collect():
+                return [match async for match in self.matchHistoryAsync(platform, gamertag, cursor, **kwargs)]
+
+            return self._run(collect())
     # WZ
 
     class __WZ(__GameDataCommons):
@@ -545,85 +2098,86 @@ class API:
 
     # USER
     class __USER(_Common):
-        def info(self):
-            if self.loggedIn:
-                # Assuming 'user_info.json' is the file you've downloaded with the information
-                file_path = 'userInfo.json'
-                # Load the JSON content from the local file
-                with open(file_path, 'r') as file:
-                    rawData = json.load(file)
+        # the requests are about the logged in user, they have to be sent with the client's own account
+        _pooled = False
+
+        # platform gamertag
+        friendFeedUrl = "/userfeed/v1/friendFeed/platform/%s/gamer/%s/friendFeedEvents/en"
+        # ssoToken
+        eventFeedUrl = "/userfeed/v1/friendFeed/rendered/en/%s"
+        # platform gamertag
+        codPointsUrl = "/inventory/v1/title/mw/platform/%s/gamer/%s/currency"
+        # platform gamertag
+        connectedAccountsUrl = "/crm/cod/v2/accounts/platform/%s/gamer/%s"
+        # platform gamertag
+        settingsUrl = "/preferences/v1/platform/%s/gamer/%s/list"
+
+        def userInfo(self) -> UserInfo:
+            """the logged in user's name and identities from ``userInfo.json`` as a ``UserInfo``"""
+            # reads a local file, a lazily given token doesn't have to be validated for it
+            if self.loggedIn or self._api._account.pending:
                 try:
-                    userInfo = rawData['userInfo']  # Accessing the nested 'userInfo' dictionary
-                    identities = rawData.get('identities', [])  # Accessing the 'identities' if it exists or default to empty list
-
-                    data = {'userName': userInfo['userName'], 'identities': []}  # Getting 'userName' from the nested dictionary
-                    for i in identities:  # Loop through each identity in the 'identities' list
-                        data['identities'].append({
-                            'platform': i['provider'],
-                            'gamertag': i['username'],
-                            'accountID': i['accountID']  # Assuming 'accountID' exists; otherwise, you might need a default value
-                        })
-                    return data
-
+                    return self._api._userInfo.load()
                 except KeyError as e:
                     # Handle the case where the expected key is not found in the dictionary
                     print(f"Error: A required field is missing in the data. Details: {str(e)}")
-                    # Re-raise the exception or handle it as required
                     raise
-
             else:
                 raise NotLoggedIn
 
+        def info(self):
+            userInfo = self.userInfo()
+            return {'userName': userInfo.userName, 'identities': [i._asdict() for i in userInfo.identities]}
+
         def __priv(self):
-            d = self.info()
-            return d['identities'][0]['platform'], quote(d['identities'][0]['gamertag'].encode("utf-8"))
+            identity = self.userInfo().identities[0]
+            return identity.platform, quote(identity.gamertag.encode("utf-8"))
 
         async def friendFeedAsync(self):
             p, g = self.__priv()
-            data = await self._Common__sendRequest(
-                    f"/userfeed/v1/friendFeed/platform/{p}/gamer/{g}/friendFeedEvents/en")
+            data = await self._Common__sendRequest(self.friendFeedUrl % (p, g), "friendFeedUrl")
             return data
 
         def friendFeed(self):
-            return asyncio.run(self.friendFeedAsync())
+            return self._run(self.friendFeedAsync())
 
         async def eventFeedAsync(self):
-            data = await self._Common__sendRequest(f"/userfeed/v1/friendFeed/rendered/en/{self.sso_token()}")
+            data = await self._Common__sendRequest(self.eventFeedUrl % self.sso_token(), "eventFeedUrl")
             return data
 
         def eventFeed(self):
-            return asyncio.run(self.eventFeedAsync())
+            return self._run(self.eventFeedAsync())
 
         async def loggedInIdentitiesAsync(self):
-            data = await self._Common__sendRequest(f"/crm/cod/v2/identities/{self.sso_token()}")
+            data = await self._Common__sendRequest(self.identitiesUrl % self.sso_token(), "identitiesUrl")
             return data
 
         def loggedInIdentities(self):
-            return asyncio.run(self.loggedInIdentitiesAsync())
+            return self._run(self.loggedInIdentitiesAsync())
 
         async def codPointsAsync(self):
             p, g = self.__priv()
-            data = await self._Common__sendRequest(f"/inventory/v1/title/mw/platform/{p}/gamer/{g}/currency")
+            data = await self._Common__sendRequest(self.codPointsUrl % (p, g), "codPointsUrl")
             return data
 
         def codPoints(self):
-            return asyncio.run(self.codPointsAsync())
+            return self._run(self.codPointsAsync())
 
         async def connectedAccountsAsync(self):
             p, g = self.__priv()
-            data = await self._Common__sendRequest(f"/crm/cod/v2/accounts/platform/{p}/gamer/{g}")
+            data = await self._Common__sendRequest(self.connectedAccountsUrl % (p, g), "connectedAccountsUrl")
             return data
 
         def connectedAccounts(self):
-            return asyncio.run(self.connectedAccountsAsync())
+            return self._run(self.connectedAccountsAsync())
 
         async def settingsAsync(self):
             p, g = self.__priv()
-            data = await self._Common__sendRequest(f"/preferences/v1/platform/{p}/gamer/{g}/list")
+            data = await self._Common__sendRequest(self.settingsUrl % (p, g), "settingsUrl")
             return data
 
         def settings(self):
-            return asyncio.run(self.settingsAsync())
+            return self._run(self.settingsAsync())
 
     # SHOP
     class __SHOP(_Common):
@@ -655,39 +2209,48 @@ class API:
          battlePassLootAsync(game: games, platform: platforms, season: int)
              returns battle pass loot for specific game and season on given platform
          """
+        # game
+        purchasableItemsUrl = "/inventory/v1/title/%s/platform/uno/purchasable/public/en"
+        # game bundleId
+        bundleInformationUrl = "/inventory/v1/title/%s/bundle/%s/en"
+        # game platform season
+        battlePassLootUrl = "/loot/title/%s/platform/%s/list/loot_season_%s/en"
 
         async def purchasableItemsAsync(self, game: games):
-            data = await self._Common__sendRequest(f"/inventory/v1/title/{game.value}/platform/uno/purchasable/public/en")
+            data = await self._Common__sendRequest(self.purchasableItemsUrl % game.value, "purchasableItemsUrl")
             return data
 
         def purchasableItems(self, game: games):
-            return asyncio.run(self.purchasableItemsAsync(game))
+            return self._run(self.purchasableItemsAsync(game))
 
         async def bundleInformationAsync(self, game: games, bundleId: int):
-            data = await self._Common__sendRequest(f"/inventory/v1/title/{game.value}/bundle/{bundleId}/en")
+            data = await self._Common__sendRequest(self.bundleInformationUrl % (game.value, bundleId),
+                                                   "bundleInformationUrl")
             return data
 
         def bundleInformation(self, game: games, bundleId: int):
-            return asyncio.run(self.bundleInformationAsync(game, bundleId))
+            return self._run(self.bundleInformationAsync(game, bundleId))
 
         async def battlePassLootAsync(self, game: games, platform: platforms, season: int):
-            data = await self._Common__sendRequest(
-                f"/loot/title/{game.value}/platform/{platform.value}/list/loot_season_{season}/en")
+            data = await self._Common__sendRequest(self.battlePassLootUrl % (game.value, platform.value, season),
+                                                   "battlePassLootUrl")
             return data
 
         def battlePassLoot(self, game: games, platform: platforms, season: int):
-            return asyncio.run(self.battlePassLootAsync(game, platform, season))
+            return self._run(self.battlePassLootAsync(game, platform, season))
 
     # ALT
     class __ALT(_Common):
+        # platform gamertag
+        searchUrl = "/crm/cod/v2/platform/%s/username/%s/search"
 
         async def searchAsync(self, platform, gamertag: str):
             lookUpType, gamertag, platform = self._Common__helper(platform, gamertag)
-            data = await self._Common__sendRequest(f"/crm/cod/v2/platform/{platform.value}/username/{gamertag}/search")
+            data = await self._Common__sendRequest(self.searchUrl % (platform.value, gamertag), "searchUrl")
             return data
 
         def search(self, platform, gamertag: str):
-            return asyncio.run(self.searchAsync(platform, gamertag))
+            return self._run(self.searchAsync(platform, gamertag))
 
 
 # Exceptions
@@ -720,6 +2283,14 @@ class InvalidPlatform(Exception):
         return self.message
 
 
+class CircuitOpen(Exception):
+    def __init__(self, host: str):
+        self.host = host
+
+    def __str__(self):
+        return f"Requests to {self.host} are paused after repeated failures, try again later."
+
+
 class InvalidEndpoint(Exception):
     def __str__(self):
         return "This endpoint is not available for selected title"
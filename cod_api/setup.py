@@ -1,9 +1,10 @@
 from setuptools import setup
 
-requirements = ["asyncio", "aiohttp", "datetime", "requests", "uuid", "urllib3", "enum34"]
+requirements = ["asyncio", "aiohttp", "datetime", "uuid", "enum34"]
 
 setup(
     name="cod_api",
     packages=['cod_api'],
+    package_data={'cod_api': ['mappings.json']},
     install_requires=requirements
 )
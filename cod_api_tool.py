@@ -3,7 +3,10 @@ import sys
 import json
 import os
 import argparse
-from cod_api import API, platforms
+import time
+from cod_api import API, BatchRequest, LoginCache, ResponseCache, games, platforms
+from match_store import MatchStore
+import match_export
 import asyncio
 import datetime
 
@@ -13,13 +16,21 @@ if os.name == 'nt':
 
 # Constants
 COOKIE_FILE = 'cookie.txt'
+LOGIN_FILE = 'login.json'
 STATS_DIR = 'stats'
 MATCH_DIR = 'matches'
+CACHE_DIR = 'cache'
 REPLACEMENTS_FILE = 'data/replacements.json'
 TIMEZONE_OPTIONS = ["GMT", "EST", "CST", "PST"]
+DEFAULT_WORKERS = 8
+DEFAULT_WATCH_INTERVAL = 300
+SYNC_FILE = 'sync.json'
+MATCH_STORE_FILE = os.path.join(STATS_DIR, 'matches.db')
 
-# Initialize API
-api = API()
+# Initialize API, repeated requests are served from the on-disk response cache and a validated
+# login is remembered for a day
+response_cache = ResponseCache(CACHE_DIR)
+api = API(cache=response_cache, loginCache=LoginCache(LOGIN_FILE))
 
 class CodStatsManager:
     """Main class to manage COD API interactions and data processing."""
@@ -28,7 +39,12 @@ class CodStatsManager:
         self._ensure_directories_exist()
         self.replacements = self._load_replacements()
         self.api_key = self._get_api_key()
-        api.login(self.api_key)
+        # Per player state of the watch mode: newest stored match and the stored match ids
+        self._sync_states = {}
+        # Set to a MatchStore to keep match histories and lifetime stats in SQLite instead of JSON files
+        self.match_store = None
+        # Validated on first use, cleaning runs never touch the network
+        api.login(self.api_key, lazy=True)
         
     def _ensure_directories_exist(self):
         """Ensure necessary directories exist."""
@@ -66,12 +82,23 @@ class CodStatsManager:
                 f.write(api_key)
             return api_key
             
-    def save_to_file(self, data, filename):
+    def save_to_file(self, data, filename, directory=STATS_DIR):
         """Save data to a JSON file."""
-        file_path = os.path.join(STATS_DIR, filename)
+        file_path = os.path.join(directory, filename)
         with open(file_path, 'w') as json_file:
             json.dump(data, json_file, indent=4)
         print(f"Data saved to {file_path}")
+
+    def _save_player_data(self, player_name, data, filename, directory=STATS_DIR):
+        """Save a player's response, match histories and lifetime stats go to the match store when one is used."""
+        if self.match_store is None or filename not in ('stats.json', 'match_info.json') or data.get('status') != 'success':
+            self.save_to_file(data, filename, directory)
+        elif filename == 'match_info.json':
+            count = self.match_store.upsert_matches(player_name, data['data'].get('matches') or [])
+            print(f"{count} matches of {player_name} stored in {self.match_store.path}")
+        else:
+            self.match_store.add_snapshot(player_name, data['data'])
+            print(f"Lifetime stats of {player_name} stored in {self.match_store.path}")
             
     def get_player_name(self):
         """Get player name from user input."""
@@ -99,45 +126,230 @@ class CodStatsManager:
         """Fetch basic player stats and match history."""
         player_stats = api.ModernWarfare.fullData(platforms.Activision, player_name)
         match_info = api.ModernWarfare.combatHistory(platforms.Activision, player_name)
-        self.save_to_file(player_stats, 'stats.json')
-        self.save_to_file(match_info, 'match_info.json')
+        self._save_player_data(player_name, player_stats, 'stats.json')
+        self._save_player_data(player_name, match_info, 'match_info.json')
         
     def _fetch_all_stats(self, player_name):
         """Fetch all available stats for a player."""
-        # Basic stats
-        player_stats = api.ModernWarfare.fullData(platforms.Activision, player_name)
-        match_info = api.ModernWarfare.combatHistory(platforms.Activision, player_name)
-        season_loot_data = api.ModernWarfare.seasonLoot(platforms.Activision, player_name)
-        
-        # Player-specific data
-        identities_data = api.Me.loggedInIdentities()
-        map_list = api.ModernWarfare.mapList(platforms.Activision)
-        
-        # Save basic data
-        self.save_to_file(player_stats, 'stats.json')
-        self.save_to_file(match_info, 'match_info.json')
-        self.save_to_file(season_loot_data, 'season_loot.json')
-        self.save_to_file(map_list, 'map_list.json')
-        self.save_to_file(identities_data, 'identities.json')
-        
+        api.run(self._fetch_all_stats_async(player_name))
+
+    def _player_batch(self, player_name, all_stats=True):
+        """Requests for the player's own stats as (BatchRequest, filename) pairs."""
+        endpoints = [('fullData', 'stats.json'), ('combatHistory', 'match_info.json')]
+        if all_stats:
+            endpoints.append(('seasonLoot', 'season_loot.json'))
+        return [(BatchRequest(games.ModernWarfare, endpoint, platforms.Activision, player_name), filename)
+                for endpoint, filename in endpoints]
+
+    def _player_requests(self, player_name, all_stats=True):
+        """Requests for the player's own stats as (coroutine, filename) pairs."""
+        return [(getattr(api.ModernWarfare, f"{request.endpoint}Async")(request.platform, request.gamertag), filename)
+                for request, filename in self._player_batch(player_name, all_stats)]
+
+    async def _fetch_all_stats_async(self, player_name):
+        """Fetch all available stats for a player concurrently, saving each response as it arrives."""
+        requests = self._player_requests(player_name) + [
+            (api.ModernWarfare.mapListAsync(platforms.Activision), 'map_list.json'),
+            # Player-specific data
+            (api.Me.loggedInIdentitiesAsync(), 'identities.json'),
+        ]
+
         # Check if userInfo.json exists to determine if we should fetch additional data
         user_info_file = os.path.join('userInfo.json')
         if os.path.exists(user_info_file):
-            # Additional user data
-            info = api.Me.info()
-            friend_feed = api.Me.friendFeed()
-            event_feed = api.Me.eventFeed()
-            cod_points = api.Me.codPoints()
-            connected_accounts = api.Me.connectedAccounts()
-            settings = api.Me.settings()
-
-            # Save additional data
-            self.save_to_file(info, 'info.json')
-            self.save_to_file(friend_feed, 'friendFeed.json')
-            self.save_to_file(event_feed, 'eventFeed.json')
-            self.save_to_file(cod_points, 'cp.json')
-            self.save_to_file(connected_accounts, 'connectedAccounts.json')
-            
+            # Additional user data, info() is read from the local file
+            self.save_to_file(api.Me.info(), 'info.json')
+            requests += [
+                (api.Me.friendFeedAsync(), 'friendFeed.json'),
+                (api.Me.eventFeedAsync(), 'eventFeed.json'),
+                (api.Me.codPointsAsync(), 'cp.json'),
+                (api.Me.connectedAccountsAsync(), 'connectedAccounts.json'),
+                (api.Me.settingsAsync(), 'settings.json'),
+            ]
+
+        async def fetch(request, filename):
+            self._save_player_data(player_name, await request, filename)
+
+        await asyncio.gather(*(fetch(request, filename) for request, filename in requests))
+
+    def fetch_players(self, players, workers=DEFAULT_WORKERS, all_stats=False):
+        """Fetch the stats of many players concurrently into stats/<player>/ and print a summary."""
+        start = time.perf_counter()
+        results = api.run(self._fetch_players_async(players, workers, all_stats))
+        self._print_batch_summary(results, time.perf_counter() - start)
+        return results
+
+    async def _fetch_players_async(self, players, workers, all_stats):
+        """Fetch players with the requests of at most `workers` of them in flight, returning {player: (seconds, error)}.
+
+        The requests of all players run through api.iterManyAsync, a player's seconds are counted from the start of
+        the batch to its last response.
+        """
+        batches = {player_name: self._player_batch(player_name, all_stats) for player_name in players}
+        filenames = {request: filename for batch in batches.values() for request, filename in batch}
+        remaining = {player_name: len(batch) for player_name, batch in batches.items()}
+        errors = {player_name: [] for player_name in batches}
+        for player_name in batches:
+            os.makedirs(os.path.join(STATS_DIR, self._player_directory(player_name)), exist_ok=True)
+
+        start = time.perf_counter()
+        results = {}
+        limit = workers * max(remaining.values(), default=1)
+        async for request, data in api.iterManyAsync(filenames, limit):
+            player_name, filename = request.gamertag, filenames[request]
+            # Error responses aren't saved, they would overwrite the stats of an earlier run
+            if data.get('status') != 'success':
+                errors[player_name].append(f"{filename}: {data.get('data', {}).get('message', 'request failed')}")
+            else:
+                directory = os.path.join(STATS_DIR, self._player_directory(player_name))
+                self._save_player_data(player_name, data, filename, directory)
+            remaining[player_name] -= 1
+            if not remaining[player_name]:
+                results[player_name] = (time.perf_counter() - start, '; '.join(errors[player_name]) or None)
+        return results
+
+    def watch(self, players, interval=DEFAULT_WATCH_INTERVAL, workers=DEFAULT_WORKERS, timezone='GMT'):
+        """Poll the players' match history every `interval` seconds until interrupted, saving only new matches."""
+        print(f"Watching {len(players)} player(s) every {interval}s, press Ctrl+C to stop.")
+        try:
+            api.run(self._watch_async(players, interval, workers, timezone))
+        except KeyboardInterrupt:
+            print("Stopped watching.")
+
+    async def _watch_async(self, players, interval, workers, timezone):
+        semaphore = asyncio.Semaphore(workers)
+
+        async def sync(player_name):
+            async with semaphore:
+                try:
+                    return await self._sync_player(player_name, timezone)
+                except Exception as e:
+                    print(f"Sync of {player_name} failed: {e}")
+                    return 0
+
+        while True:
+            start = time.perf_counter()
+            new = await asyncio.gather(*(sync(player_name) for player_name in players))
+            elapsed = time.perf_counter() - start
+            print(f"[{datetime.datetime.now():%H:%M:%S}] {sum(new)} new match(es) in {elapsed:.1f}s")
+            await asyncio.sleep(max(0, interval - elapsed))
+
+    async def _sync_player(self, player_name, timezone='GMT'):
+        """Save the player's matches that aren't stored yet to stats/<player>/matches/<matchID>.json.
+
+        The first sync stores the latest matches from combatHistory, later ones only request the history since the
+        newest stored match. With a match store the matches are upserted into it instead. Returns the number of new
+        matches.
+        """
+        player_dir = os.path.join(STATS_DIR, self._player_directory(player_name))
+        matches_dir = os.path.join(player_dir, MATCH_DIR)
+        state = self._sync_states.get(player_name)
+        if state is None and self.match_store is not None:
+            latest = self.match_store.latest_start(player_name)
+            state = self._sync_states[player_name] = {'latest': latest * 1000 if latest is not None else None,
+                                                      'known': self.match_store.match_ids(player_name)}
+        elif state is None:
+            # The ids already on disk are listed once, later syncs keep the set up to date
+            os.makedirs(matches_dir, exist_ok=True)
+            state = self._sync_states[player_name] = self._load_sync_state(player_dir)
+            state['known'] = {name[:-len('.json')] for name in os.listdir(matches_dir) if name.endswith('.json')}
+        known = state['known']
+
+        if state['latest'] is None:
+            # Polls bypass the response cache, a cached history would hide new matches
+            response = await api.ModernWarfare.combatHistoryAsync(platforms.Activision, player_name, cache=False)
+            if response['status'] != 'success':
+                raise RuntimeError(response['data'].get('message', 'request failed'))
+            matches = response['data'].get('matches') or []
+        else:
+            matches = []
+            history = api.ModernWarfare.matchHistoryAsync(platforms.Activision, player_name,
+                                                          since=state['latest'], emptyWindows=1, cache=False)
+            try:
+                # Newest first, everything after the first stored match is stored as well
+                async for match in history:
+                    if match['matchID'] in known:
+                        break
+                    matches.append(match)
+            finally:
+                await history.aclose()
+
+        new = [match for match in matches if match['matchID'] not in known]
+        if new and self.match_store is not None:
+            self.match_store.upsert_matches(player_name, new)
+        for match in new:
+            latest = match['utcStartSeconds'] * 1000
+            state['latest'] = max(state['latest'] or 0, latest)
+            if self.match_store is None:
+                self.save_to_file(self._beautify_match(match, timezone), f"{match['matchID']}.json", matches_dir)
+            known.add(match['matchID'])
+        if new and self.match_store is None:
+            with open(os.path.join(player_dir, SYNC_FILE), 'w') as file:
+                json.dump({'latest': state['latest']}, file)
+        return len(new)
+
+    def _load_sync_state(self, player_dir):
+        """Sync state of a player: the start (epoch milliseconds) of the newest stored match."""
+        file_path = os.path.join(player_dir, SYNC_FILE)
+        if not os.path.exists(file_path):
+            return {'latest': None}
+        with open(file_path, 'r') as file:
+            return {'latest': json.load(file).get('latest')}
+
+    def _beautify_match(self, match, timezone='GMT'):
+        """Beautify a single match the way split match files are, without its loadouts."""
+        match = json.loads(json.dumps(match))
+        if 'player' in match:
+            match['player'].pop('loadouts', None)
+            match['player'].pop('loadout', None)
+        self._replace_time_and_duration_recursive(match, timezone)
+        return self._recursive_key_replace(match)
+
+    def export_matches(self, directory, export_format='npz'):
+        """Export the match histories as columnar tables, from the match store when one is used."""
+        if self.match_store is not None:
+            histories = ((player, {'matches': [match]}) for player, match in self.match_store.entries())
+        else:
+            histories = self._match_info_histories()
+        tables = match_export.flatten(histories)
+        for path in match_export.export(tables, directory, export_format):
+            print(f"Exported {len(tables[os.path.splitext(os.path.basename(path))[0]])} rows to {path}")
+
+    def _match_info_histories(self):
+        """(player, data) of match_info.json and the stats/<player>/match_info.json files that aren't beautified."""
+        paths = [os.path.join(STATS_DIR, 'match_info.json')]
+        paths += [os.path.join(STATS_DIR, name, 'match_info.json') for name in sorted(os.listdir(STATS_DIR))]
+        for file_path in paths:
+            if not os.path.isfile(file_path):
+                continue
+            with open(file_path, 'r') as file:
+                data = json.load(file).get('data') or {}
+            matches = data.get('matches') or []
+            if matches and not isinstance(matches[0].get('utcStartSeconds'), int):
+                print(f"{file_path} is beautified, skipping export.")
+                continue
+            player_dir = os.path.dirname(file_path)
+            if player_dir == STATS_DIR:
+                player = (matches[0].get('player') or {}).get('username', '') if matches else ''
+            else:
+                player = os.path.basename(player_dir)
+            yield player, data
+
+    def _player_directory(self, player_name):
+        """Directory name for a player, characters that aren't safe in paths are replaced."""
+        return re.sub(r'[^\w#.-]', '_', player_name)
+
+    def _print_batch_summary(self, results, elapsed):
+        """Print successes, failures and timings of a batch run."""
+        failed = {player: error for player, (_, error) in results.items() if error}
+        timings = sorted(seconds for seconds, _ in results.values())
+        print(f"\nFetched {len(results) - len(failed)} of {len(results)} players in {elapsed:.1f}s")
+        if timings:
+            print(f"Players done after: mean {sum(timings) / len(timings):.2f}s, "
+                  f"median {timings[len(timings) // 2]:.2f}s, slowest {timings[-1]:.2f}s")
+        for player, error in failed.items():
+            print(f"Failed {player}: {error}")
+
     def _fetch_specific_data(self, player_name, options):
         """Fetch specific data based on provided options."""
         endpoints = {
@@ -476,6 +688,12 @@ def _ensure_json_serializable(self, obj):
         # Convert any other type to string representation
         return str(obj)
 
+def read_players_file(path):
+    """Read player usernames, one per line. Blank lines and lines starting with # are skipped, duplicates dropped."""
+    with open(path, 'r', encoding='utf-8') as file:
+        lines = (line.strip() for line in file)
+        return list(dict.fromkeys(line for line in lines if line and not line.startswith('#')))
+
 class CLI:
     """Command Line Interface manager."""
     
@@ -584,9 +802,15 @@ class CLI:
             choices=TIMEZONE_OPTIONS, 
             help="Specify the timezone (GMT, EST, CST, PST)"
         )
+        group_default.add_argument("-nc", "--no_cache", action="store_true", help="Ignore cached responses and always fetch fresh data")
         
         # Data fetching options
         group_data.add_argument("-p", "--player_name", type=str, help="Player's username (with #1234567)")
+        group_data.add_argument("-pf", "--players-file", type=str, help="File with one player username per line, each player's stats are saved to stats/<player>/ (with -a their season loot as well)")
+        group_data.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS, help=f"Players fetched at the same time with --players-file (default {DEFAULT_WORKERS})")
+        group_data.add_argument("-W", "--watch", action="store_true", help="Keep running and save new matches of the player(s) as they are played")
+        group_data.add_argument("--interval", type=int, default=DEFAULT_WATCH_INTERVAL, help=f"Seconds between match history polls with --watch (default {DEFAULT_WATCH_INTERVAL})")
+        group_data.add_argument("-db", "--database", nargs='?', const=MATCH_STORE_FILE, help=f"Store match histories and lifetime stats in an SQLite database instead of JSON files (default {MATCH_STORE_FILE})")
         group_data.add_argument("-a", "--all_stats", action="store_true", help="Fetch all the different types of stats data")
         group_data.add_argument("-sl", "--season_loot", action="store_true", help="Fetch only the season loot data")
         group_data.add_argument("-id", "--identities", action="store_true", help="Fetch only the logged-in identities data")
@@ -605,11 +829,18 @@ class CLI:
         group_cleaning.add_argument("-cmd", "--clean_match_data", action="store_true", help="Beautify match_info.json data")
         group_cleaning.add_argument("-cff", "--clean_friend_feed", action="store_true", help="Clean friend feed data")
         group_cleaning.add_argument("-cef", "--clean_event_feed", action="store_true", help="Clean event feed data")
+        group_cleaning.add_argument("-x", "--export", type=str, metavar="DIRECTORY", help="Export match stats and summaries as columnar tables for analytics (from the database with -db)")
+        group_cleaning.add_argument("-xf", "--export_format", choices=match_export.FORMATS, default="npz", help="Format of --export: NumPy .npz (needs numpy) or Parquet (needs pyarrow)")
         
         return parser
         
     def run_cli_mode(self, args):
         """Run the command line mode with parsed arguments."""
+        if args.no_cache:
+            response_cache.enabled = False
+        if args.database:
+            self.stats_manager.match_store = MatchStore(args.database)
+            
         # Prioritize cleaning operations
         if args.clean:
             self.stats_manager.beautify_all_data(timezone=args.timezone)
@@ -623,6 +854,13 @@ class CLI:
             self.stats_manager.clean_json_files('friendFeed.json')
         elif args.clean_event_feed:
             self.stats_manager.clean_json_files('eventFeed.json')
+        elif args.export:
+            self.stats_manager.export_matches(args.export, args.export_format)
+        elif args.watch:
+            players = read_players_file(args.players_file) if args.players_file else [args.player_name or self.stats_manager.get_player_name()]
+            self.stats_manager.watch(players, args.interval, args.workers, args.timezone)
+        elif args.players_file:
+            self.stats_manager.fetch_players(read_players_file(args.players_file), args.workers, args.all_stats)
         else:
             # Data fetching operations
             options = {
@@ -644,14 +882,20 @@ def main():
     stats_manager = CodStatsManager()
     cli = CLI(stats_manager)
     
-    # Parse command line arguments
-    if len(sys.argv) > 1:
-        parser = cli.setup_argument_parser()
-        args = parser.parse_args()
-        cli.run_cli_mode(args)
-    else:
-        # Run interactive mode
-        cli.run_interactive_mode()
+    try:
+        # Parse command line arguments
+        if len(sys.argv) > 1:
+            parser = cli.setup_argument_parser()
+            args = parser.parse_args()
+            cli.run_cli_mode(args)
+        else:
+            # Run interactive mode
+            cli.run_interactive_mode()
+    finally:
+        # Release pooled connections and stop the API's background event loop
+        api.close()
+        if stats_manager.match_store is not None:
+            stats_manager.match_store.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
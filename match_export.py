@@ -0,0 +1,141 @@
+"""
+Columnar export of match histories for analytics.
+
+Flattens the ``playerStats`` of every match and the per mode ``summary`` blocks of combatHistory responses into typed
+columns, one table per kind, and writes them as NumPy ``.npz`` archives or Parquet files. Map, mode, result and player
+are dictionary encoded. numpy and pyarrow are optional and only imported when a table is written:
+
+    tables = flatten([('Username#1234567', response['data'])])
+    export(tables, 'export', 'parquet')
+
+The values the API sends are expected, histories beautified with ``--clean`` have human readable times in place of
+numbers and can't be exported.
+"""
+
+import math
+import os
+
+# playerStats of a match exported as columns
+MATCH_STATS = ('kills', 'deaths', 'kdRatio', 'assists', 'headshots', 'accuracy', 'damageDone', 'damageTaken', 'score',
+               'scorePerMinute', 'timePlayed', 'totalXp', 'shotsFired', 'shotsLanded', 'longestStreak')
+# stats of a summary block exported as columns
+SUMMARY_STATS = ('matchesPlayed', 'wins', 'losses', 'draws', 'kills', 'deaths', 'kdRatio', 'assists', 'headshots',
+                 'accuracy', 'damageDone', 'damageTaken', 'score', 'scorePerMinute', 'timePlayed', 'totalXp')
+
+MATCH_SCHEMA = ((('player', 'category'), ('matchID', 'str'), ('utcStartSeconds', 'int'), ('duration', 'int'),
+                 ('map', 'category'), ('mode', 'category'), ('result', 'category'))
+                + tuple((name, 'float') for name in MATCH_STATS))
+SUMMARY_SCHEMA = (('player', 'category'), ('mode', 'category')) + tuple((name, 'float') for name in SUMMARY_STATS)
+
+FORMATS = ('npz', 'parquet')
+
+
+class ColumnTable:
+    """
+    Rows stored column by column, typed by a schema of (name, kind) pairs.
+
+    Kinds are ``int`` (missing values are -1), ``float`` (missing values are NaN), ``str`` and ``category``, a string
+    column stored as int32 codes into a dictionary of its distinct values.
+    """
+
+    def __init__(self, schema):
+        self.schema = tuple(schema)
+        self.columns = {name: [] for name, _ in self.schema}
+        self.dictionaries = {name: {} for name, kind in self.schema if kind == 'category'}
+
+    def __len__(self):
+        return len(self.columns[self.schema[0][0]])
+
+    def append(self, values):
+        for name, kind in self.schema:
+            value = values.get(name)
+            if kind == 'float':
+                value = float(value) if _is_number(value) else math.nan
+            elif kind == 'int':
+                value = int(value) if _is_number(value) else -1
+            elif kind == 'category':
+                dictionary = self.dictionaries[name]
+                value = dictionary.setdefault('' if value is None else str(value), len(dictionary))
+            else:
+                value = '' if value is None else str(value)
+            self.columns[name].append(value)
+
+    def labels(self, name):
+        """Values of a category column in code order."""
+        return list(self.dictionaries[name])
+
+    def to_numpy(self):
+        """Arrays by column name, a category column adds its labels as ``<name>_labels``."""
+        numpy = _require('numpy')
+        dtypes = {'int': numpy.int64, 'float': numpy.float64, 'category': numpy.int32, 'str': numpy.str_}
+        arrays = {}
+        for name, kind in self.schema:
+            arrays[name] = numpy.array(self.columns[name], dtype=dtypes[kind])
+            if kind == 'category':
+                arrays[f'{name}_labels'] = numpy.array(self.labels(name), dtype=numpy.str_)
+        return arrays
+
+    def to_arrow(self):
+        """A pyarrow Table, category columns become dictionary arrays."""
+        pyarrow = _require('pyarrow')
+        types = {'int': pyarrow.int64(), 'float': pyarrow.float64(), 'str': pyarrow.string()}
+        arrays = {}
+        for name, kind in self.schema:
+            if kind == 'category':
+                arrays[name] = pyarrow.DictionaryArray.from_arrays(
+                    pyarrow.array(self.columns[name], type=pyarrow.int32()), pyarrow.array(self.labels(name)))
+            else:
+                arrays[name] = pyarrow.array(self.columns[name], type=types[kind])
+        return pyarrow.table(arrays)
+
+
+def flatten(histories):
+    """
+    Tables ``matches`` and ``summary`` of (player, combatHistory data) pairs.
+
+    The data is the ``data`` part of a response: its ``matches`` are added to the matches table and every mode of its
+    ``summary`` to the summary table. Data without a summary, e.g. from the match store, only adds matches.
+    """
+    tables = {'matches': ColumnTable(MATCH_SCHEMA), 'summary': ColumnTable(SUMMARY_SCHEMA)}
+    for player, data in histories:
+        for match in data.get('matches') or []:
+            tables['matches'].append(dict(match.get('playerStats') or {}, player=player, matchID=match.get('matchID'),
+                                          utcStartSeconds=match.get('utcStartSeconds'),
+                                          duration=match.get('duration'), map=match.get('map'),
+                                          mode=match.get('mode'), result=match.get('result')))
+        for mode, stats in (data.get('summary') or {}).items():
+            tables['summary'].append(dict(stats, player=player, mode=mode))
+    return tables
+
+
+def export(tables, directory, format='npz'):
+    """Write every non-empty table to `directory` as ``<table>.npz`` or ``<table>.parquet``, returns the paths."""
+    if format not in FORMATS:
+        raise ValueError(f"Unknown export format {format!r}, use one of {', '.join(FORMATS)}")
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name, table in tables.items():
+        if not len(table):
+            continue
+        path = os.path.join(directory, f'{name}.{format}')
+        if format == 'npz':
+            _require('numpy').savez_compressed(path, **table.to_numpy())
+        else:
+            _require('pyarrow')
+            import pyarrow.parquet
+            pyarrow.parquet.write_table(table.to_arrow(), path)
+        paths.append(path)
+    return paths
+
+
+def _is_number(value):
+    # bools are ints, but not stats
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _require(name):
+    """Import an optional dependency of the export."""
+    try:
+        return __import__(name)
+    except ImportError:
+        raise ImportError(f"Exporting needs {name}, install it with: pip install {name}") from None
@@ -0,0 +1,222 @@
+"""
+SQLite storage of match histories and lifetime stats.
+
+Matches are stored once per matchID, every tracked player's stats of a match once per (matchID, player), so a lobby
+shared by several tracked players is stored only once. The values the API sends are stored as they are, the full
+response of every entry is kept as JSON next to the columns that are indexed or commonly aggregated:
+
+    with MatchStore('stats/matches.db') as store:
+        store.upsert_matches('Username#1234567', response['data']['matches'])
+        store.matches('Username#1234567', since=1700000000, mode='war')
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    matchID TEXT PRIMARY KEY,
+    utcStartSeconds INTEGER,
+    utcEndSeconds INTEGER,
+    duration INTEGER,
+    map TEXT,
+    mode TEXT,
+    gameType TEXT,
+    privateMatch INTEGER,
+    winningTeam TEXT,
+    team1Score INTEGER,
+    team2Score INTEGER
+);
+CREATE INDEX IF NOT EXISTS matches_start ON matches (utcStartSeconds);
+CREATE INDEX IF NOT EXISTS matches_map ON matches (map);
+CREATE INDEX IF NOT EXISTS matches_mode ON matches (mode);
+
+CREATE TABLE IF NOT EXISTS player_matches (
+    matchID TEXT NOT NULL REFERENCES matches (matchID),
+    player TEXT NOT NULL,
+    utcStartSeconds INTEGER,
+    team TEXT,
+    result TEXT,
+    kills REAL,
+    deaths REAL,
+    kdRatio REAL,
+    assists REAL,
+    headshots REAL,
+    accuracy REAL,
+    score REAL,
+    scorePerMinute REAL,
+    damageDone REAL,
+    damageTaken REAL,
+    timePlayed REAL,
+    totalXp REAL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (matchID, player)
+);
+CREATE INDEX IF NOT EXISTS player_matches_player ON player_matches (player, utcStartSeconds);
+
+CREATE TABLE IF NOT EXISTS loadouts (
+    matchID TEXT NOT NULL,
+    player TEXT NOT NULL,
+    slot INTEGER NOT NULL,
+    primaryWeapon TEXT,
+    secondaryWeapon TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (matchID, player, slot),
+    FOREIGN KEY (matchID, player) REFERENCES player_matches (matchID, player)
+);
+CREATE INDEX IF NOT EXISTS loadouts_primary ON loadouts (primaryWeapon);
+
+CREATE TABLE IF NOT EXISTS snapshots (
+    player TEXT NOT NULL,
+    takenAt INTEGER NOT NULL,
+    level REAL,
+    prestige REAL,
+    totalXp REAL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (player, takenAt)
+);
+"""
+
+MATCH_COLUMNS = ('matchID', 'utcStartSeconds', 'utcEndSeconds', 'duration', 'map', 'mode', 'gameType',
+                 'privateMatch', 'winningTeam', 'team1Score', 'team2Score')
+# playerStats kept in their own columns, the others are only in the data column
+STAT_COLUMNS = ('kills', 'deaths', 'kdRatio', 'assists', 'headshots', 'accuracy', 'score', 'scorePerMinute',
+                'damageDone', 'damageTaken', 'timePlayed', 'totalXp')
+PLAYER_COLUMNS = ('matchID', 'player', 'utcStartSeconds', 'team', 'result') + STAT_COLUMNS + ('data',)
+LOADOUT_COLUMNS = ('matchID', 'player', 'slot', 'primaryWeapon', 'secondaryWeapon', 'data')
+SNAPSHOT_COLUMNS = ('player', 'takenAt', 'level', 'prestige', 'totalXp', 'data')
+
+
+def _upsert(table, columns, key):
+    """INSERT statement of a table that updates the existing row of the same key."""
+    updates = ', '.join(f'{c} = excluded.{c}' for c in columns if c not in key)
+    return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT ({', '.join(key)}) DO UPDATE SET {updates}")
+
+
+UPSERT_MATCH = _upsert('matches', MATCH_COLUMNS, ('matchID',))
+UPSERT_PLAYER_MATCH = _upsert('player_matches', PLAYER_COLUMNS, ('matchID', 'player'))
+UPSERT_LOADOUT = _upsert('loadouts', LOADOUT_COLUMNS, ('matchID', 'player', 'slot'))
+UPSERT_SNAPSHOT = _upsert('snapshots', SNAPSHOT_COLUMNS, ('player', 'takenAt'))
+
+
+class MatchStore:
+    """
+    Matches, per player match stats, loadouts and lifetime snapshots in one SQLite database.
+
+    Writes are bulk upserts in one transaction, storing a match again updates it. The store can be used from the
+    API's event loop thread and the main thread, its statements are serialized by a lock.
+    """
+
+    def __init__(self, path='stats/matches.db'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode = WAL')
+        self._connection.execute('PRAGMA synchronous = NORMAL')
+        self._connection.executescript(SCHEMA)
+
+    # Writing
+
+    def upsert_matches(self, player, matches):
+        """Store a player's matches as returned by combatHistory, returns the number of matches stored."""
+        match_rows, player_rows, loadout_rows = [], [], []
+        for match in matches:
+            match_rows.append(tuple(match.get(c) for c in MATCH_COLUMNS))
+            details = match.get('player') or {}
+            stats = match.get('playerStats') or {}
+            loadouts = details.get('loadouts') or details.get('loadout') or []
+            # the loadouts have their own table, the rest of the entry is kept as is
+            data = dict(match, player={k: v for k, v in details.items() if k not in ('loadouts', 'loadout')})
+            player_rows.append((match['matchID'], player, match.get('utcStartSeconds'), details.get('team'),
+                                match.get('result')) + tuple(stats.get(c) for c in STAT_COLUMNS) +
+                               (_dumps(data),))
+            for slot, loadout in enumerate(loadouts):
+                loadout_rows.append((match['matchID'], player, slot, _weapon(loadout.get('primaryWeapon')),
+                                     _weapon(loadout.get('secondaryWeapon')), _dumps(loadout)))
+
+        with self._lock, self._connection:
+            self._connection.executemany(UPSERT_MATCH, match_rows)
+            self._connection.executemany(UPSERT_PLAYER_MATCH, player_rows)
+            self._connection.executemany(UPSERT_LOADOUT, loadout_rows)
+        return len(match_rows)
+
+    def add_snapshot(self, player, data, taken_at=None):
+        """Store the lifetime stats of a fullData response's data, taken now unless `taken_at` (epoch seconds)."""
+        taken_at = int(time.time()) if taken_at is None else taken_at
+        row = (player, taken_at, data.get('level'), data.get('prestige'), data.get('totalXp'), _dumps(data))
+        with self._lock, self._connection:
+            self._connection.execute(UPSERT_SNAPSHOT, row)
+
+    # Reading
+
+    def match_ids(self, player):
+        """IDs of the player's stored matches."""
+        with self._lock:
+            rows = self._connection.execute('SELECT matchID FROM player_matches WHERE player = ?', (player,))
+            return {row[0] for row in rows}
+
+    def latest_start(self, player):
+        """Start (epoch seconds) of the player's newest stored match, None without matches."""
+        with self._lock:
+            return self._connection.execute('SELECT MAX(utcStartSeconds) FROM player_matches WHERE player = ?',
+                                            (player,)).fetchone()[0]
+
+    def matches(self, player=None, since=None, until=None, map=None, mode=None, limit=None):
+        """Stored match entries, newest first, filtered by player, start time (epoch seconds), map and mode."""
+        query = 'SELECT p.data FROM player_matches p JOIN matches m ON m.matchID = p.matchID WHERE 1 = 1'
+        params = []
+        for clause, value in (('p.player = ?', player), ('p.utcStartSeconds >= ?', since),
+                              ('p.utcStartSeconds < ?', until), ('m.map = ?', map), ('m.mode = ?', mode)):
+            if value is not None:
+                query += f' AND {clause}'
+                params.append(value)
+        query += ' ORDER BY p.utcStartSeconds DESC'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+        with self._lock:
+            return [json.loads(row[0]) for row in self._connection.execute(query, params)]
+
+    def entries(self, batch_size=1000):
+        """Every stored (player, match entry) pair, read in batches so large archives aren't loaded at once."""
+        last = ('', '')
+        while True:
+            # keyset paging over the primary key, every batch is an index seek
+            with self._lock:
+                rows = self._connection.execute('SELECT matchID, player, data FROM player_matches '
+                                                'WHERE (matchID, player) > (?, ?) ORDER BY matchID, player LIMIT ?',
+                                                last + (batch_size,)).fetchall()
+            for _, player, data in rows:
+                yield player, json.loads(data)
+            if len(rows) < batch_size:
+                return
+            last = rows[-1][:2]
+
+    def snapshots(self, player):
+        """The player's lifetime snapshots as (taken at, data), oldest first."""
+        with self._lock:
+            rows = self._connection.execute('SELECT takenAt, data FROM snapshots WHERE player = ? ORDER BY takenAt',
+                                            (player,))
+            return [(taken_at, json.loads(data)) for taken_at, data in rows]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _dumps(data):
+    # compact, the entries are stored by the hundreds of thousands
+    return json.dumps(data, separators=(',', ':'))
+
+
+def _weapon(weapon):
+    return weapon.get('name') if isinstance(weapon, dict) else None
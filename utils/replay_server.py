@@ -0,0 +1,267 @@
+"""
+Local stand-in for the Call of Duty profile API that replays the responses in examples/.
+
+Implements the routes cod_api requests (profile stats, combat history, match details, season loot, map list,
+identities, user feeds and the other "Me" routes) so the client can be load tested and benchmarked offline. Latency,
+server errors and 429s can be injected, and every SSO token is limited to a number of requests per second like a real
+account.
+
+    python utils/replay_server.py --port 8080 --latency 0.05 --error-rate 0.01 --rate-limit 5
+
+Point the client at it with ``API(baseUrl="http://127.0.0.1:8080")``. In Python the server can also run on a
+background thread:
+
+    with ReplayServer(latency=0.02) as server:
+        api = API(baseUrl=server.url)
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import random
+import threading
+import time
+import zlib
+
+from aiohttp import web
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLES = os.path.join(ROOT, 'examples')
+
+# Route -> example file served for it
+FIXTURES = {
+    'fullData': 'stats.json',
+    'seasonLoot': 'season_loot.json',
+    'mapList': 'map_list.json',
+    'identities': 'identities.json',
+    'friendFeed': 'friendFeed.json',
+    'eventFeed': 'eventFeed.json',
+    'codPoints': 'cp.json',
+    'connectedAccounts': 'connectedAccounts.json',
+    'settings': 'settings.json',
+}
+
+
+class ReplayServer:
+    """
+    Serves the example responses with configurable latency, errors and rate limits.
+
+    latency: seconds every response is delayed, plus a random ``jitter`` of up to that many seconds
+    error_rate: share of requests answered with a 503
+    rate_429: share of requests answered with a 429 regardless of the rate limit
+    rate_limit: requests per second allowed per SSO token (0 is unlimited), excess requests get a 429
+    retry_after: seconds sent as Retry-After with every 429
+    history_size: number of matches in every player's synthesized match history
+    history_days: days the synthesized history is spread over, ending when the server started
+    reject_tokens: SSO tokens the identities route rejects
+
+    The settings are plain attributes and can be changed while the server runs.
+    """
+
+    def __init__(self, host='127.0.0.1', port=8080, latency=0.0, jitter=0.0, error_rate=0.0, rate_429=0.0,
+                 rate_limit=0.0, retry_after=1, history_size=200, history_days=90, reject_tokens=()):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.history_size = history_size
+        self.history_days = history_days
+        self.reject_tokens = set(reject_tokens)
+        self.hits = {}
+        # histories end at the start of the server, so the same window always returns the same matches
+        self._now = int(time.time())
+        self._fixtures = {name: load_fixture(file) for name, file in FIXTURES.items()}
+        self._matches = load_matches()
+        self._buckets = {}
+        self._loop = None
+        self._thread = None
+        self._runner = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    # Routing
+
+    def app(self):
+        app = web.Application(middlewares=[self._inject])
+        route = app.router.add_get
+        player = '/title/{game}/platform/{platform}/{lookup}/{gamertag}'
+        route('/stats/cod/v1' + player + '/profile/type/{type}', self._fixture('fullData'))
+        route('/crm/cod/v2' + player + '/matches/{type}/start/{start}/end/{end}/details', self._history)
+        route('/crm/cod/v2' + player + '/matches/{type}/start/{start}/end/{end}', self._history)
+        route('/crm/cod/v2/title/{game}/platform/{platform}/fullMatch/{type}/{matchId}/en', self._match)
+        route('/loot' + player + '/status/en', self._fixture('seasonLoot'))
+        route('/ce/v1/title/{game}/platform/{platform}/gameType/mp/communityMapData/availability',
+              self._fixture('mapList'))
+        route('/crm/cod/v2/identities/{token}', self._identities)
+        route('/userfeed/v1/friendFeed/platform/{platform}/gamer/{gamertag}/friendFeedEvents/en',
+              self._fixture('friendFeed'))
+        route('/userfeed/v1/friendFeed/rendered/en/{token}', self._fixture('eventFeed'))
+        route('/inventory/v1/title/mw/platform/{platform}/gamer/{gamertag}/currency', self._fixture('codPoints'))
+        route('/crm/cod/v2/accounts/platform/{platform}/gamer/{gamertag}', self._fixture('connectedAccounts'))
+        route('/preferences/v1/platform/{platform}/gamer/{gamertag}/list', self._fixture('settings'))
+        return app
+
+    @web.middleware
+    async def _inject(self, request, handler):
+        route = request.match_info.route.resource.canonical if request.match_info.route.resource else 'unknown'
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+        if not self._allow(request.cookies.get('ACT_SSO_COOKIE')) or random.random() < self.rate_429:
+            response = web.json_response({'status': 'error', 'data': {'message': 'Too many requests'}}, status=429,
+                                         headers={'Retry-After': str(self.retry_after)})
+        elif random.random() < self.error_rate:
+            response = web.json_response({'status': 'error', 'data': {'message': 'Service unavailable'}}, status=503)
+        else:
+            response = await handler(request)
+        counts = self.hits.setdefault(route, {})
+        counts[response.status] = counts.get(response.status, 0) + 1
+        return response
+
+    def _allow(self, token):
+        # token bucket per account with one second of burst
+        if not self.rate_limit:
+            return True
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(token, (self.rate_limit, now))
+        tokens = min(self.rate_limit, tokens + (now - updated) * self.rate_limit)
+        allowed = tokens >= 1
+        self._buckets[token] = (tokens - 1 if allowed else tokens, now)
+        return allowed
+
+    # Handlers
+
+    def _fixture(self, name):
+        async def handler(request):
+            return web.json_response(self._fixtures[name])
+        return handler
+
+    async def _identities(self, request):
+        if request.match_info['token'] in self.reject_tokens:
+            return web.json_response({'status': 'error', 'data': {'message': 'Not permitted: not authenticated'}})
+        return web.json_response(self._fixtures['identities'])
+
+    async def _history(self, request):
+        start, end = int(request.match_info['start']), int(request.match_info['end'])
+        limit = int(request.query.get('limit', 20))
+        # newest first, like the real endpoint
+        matches = [m for m in self.history(request.match_info['gamertag'])
+                   if (not start or m['utcStartSeconds'] * 1000 >= start)
+                   and (not end or m['utcStartSeconds'] * 1000 <= end)][:limit]
+        return web.json_response({'status': 'success', 'data': {'summary': {}, 'matches': matches}})
+
+    async def _match(self, request):
+        match_id = request.match_info['matchId']
+        match = copy.deepcopy(self._matches[zlib.crc32(match_id.encode()) % len(self._matches)])
+        match['matchID'] = match_id
+        return web.json_response({'status': 'success', 'data': {'allPlayers': [match]}})
+
+    def history(self, gamertag):
+        """the synthesized match history of a player, newest first"""
+        now = self._now
+        spacing = self.history_days * 24 * 60 * 60 // max(1, self.history_size)
+        seed = zlib.crc32(gamertag.encode())
+        matches = []
+        for i in range(self.history_size):
+            match = dict(self._matches[(seed + i) % len(self._matches)])
+            match['utcStartSeconds'] = now - (i + 1) * spacing
+            match['utcEndSeconds'] = match['utcStartSeconds'] + 600
+            match['matchID'] = str(seed * 100000 + i)
+            matches.append(match)
+        return matches
+
+    # Running
+
+    def start(self):
+        """serves on a background thread until ``stop()``"""
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+        failure = []
+
+        def serve():
+            asyncio.set_event_loop(self._loop)
+            try:
+                self._runner = web.AppRunner(self.app())
+                self._loop.run_until_complete(self._runner.setup())
+                self._loop.run_until_complete(web.TCPSite(self._runner, self.host, self.port).start())
+            except Exception as e:
+                # e.g. the port is in use, raised again by start()
+                failure.append(e)
+                if self._runner is not None:
+                    self._loop.run_until_complete(self._runner.cleanup())
+                return
+            finally:
+                started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=serve, name='replay-server', daemon=True)
+        self._thread.start()
+        started.wait()
+        if failure:
+            self._thread.join()
+            self._loop.close()
+            self._loop = self._thread = self._runner = None
+            raise failure[0]
+        return self
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def load_fixture(name):
+    with open(os.path.join(EXAMPLES, name), 'r') as file:
+        return json.load(file)
+
+
+def load_matches():
+    """Load the example matches without the beautified fields the real API sends as numbers."""
+    with open(os.path.join(EXAMPLES, 'match_info.json'), 'r') as file:
+        matches = json.load(file)['data']['matches']
+    for match in matches:
+        match['utcStartSeconds'] = match['utcEndSeconds'] = 0
+        match['duration'] = 600000
+    return matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds every response is delayed')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Random extra delay of up to this many seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with a 503')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='Share of requests answered with a 429')
+    parser.add_argument('--rate-limit', type=float, default=0.0,
+                        help='Requests per second allowed per SSO token, 0 is unlimited')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After seconds sent with 429s')
+    parser.add_argument('--history-size', type=int, default=200, help='Matches in every player\'s history')
+    parser.add_argument('--reject-token', action='append', default=[], help='SSO token the login rejects')
+    args = parser.parse_args()
+
+    server = ReplayServer(args.host, args.port, args.latency, args.jitter, args.error_rate, args.rate_429,
+                          args.rate_limit, args.retry_after, args.history_size, reject_tokens=args.reject_token)
+    print(f"Replaying {EXAMPLES} on {server.url}, use API(baseUrl=\"{server.url}\")")
+    web.run_app(server.app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == '__main__':
+    main()